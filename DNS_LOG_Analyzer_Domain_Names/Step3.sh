@@ -1,5 +1,26 @@
-for file in RAWLogs/*; do
-  if [ -f "$file" ]; then
+# Optional: only the files with log lines between two dates (YYYY-MM-DD), the rest are skipped
+# i.e. sh Step3.sh 2025-03-14 2025-03-14
+if [ $# -eq 2 ]; then
+  python3 ../Log_Tools/timeindex.py files RAWLogs --format dns --from "$1" --to "$2"
+else
+  for file in RAWLogs/*; do
+    if [ -f "$file" ]; then
+      echo "$file"
+    fi
+  done
+fi | while IFS= read -r file; do
+  # Step1.py --keep saves where the log data starts instead of rewriting the file,
+  # tail -c seeks straight there. Blank lines and Windows line endings are dropped
+  # here because Step2.sh didn't get to clean those files. The offset is only used while
+  # the file has the same size and modification time as when it was saved.
+  offset=""
+  if [ -f RAWLogs/.header_offsets ]; then
+    offset=$(awk -F '\t' -v name="$(basename "$file")" -v stat="$(stat -c '%s %Y' "$file")" \
+      '$1 == name && NF == 4 && $3 " " $4 == stat { print $2 }' RAWLogs/.header_offsets)
+  fi
+  if [ -n "$offset" ]; then
+    tail -c +"$((offset + 1))" "$file" | tr -d '\r' | awk 'NF {print $NF}' >> Output.txt
+  else
     awk '{print $NF}' "$file" >> Output.txt
   fi
 done
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import heapq
+import hashlib
+import math
+from array import array
+from datetime import datetime
+# This tracks how many queries each client makes per time bucket and keeps an
+# exponentially weighted baseline (mean and variance) for every client.
+# When a client's bucket count is far above its own baseline (z-score) it is reported.
+# The baselines and how far we got into each log file are saved in STATE_FILE, so the
+# next run only reads the new log lines and updates the baselines. A file whose first bytes
+# changed (Step1 stripped its header, or a new log replaced it) is read again from the start,
+# skipping lines up to the last time already read from it, so nothing is counted twice.
+#
+# The new lines of all the files are read merged in time order, so logs from several DNS
+# servers (or rotated copies) that cover the same time are counted together. A bucket is
+# only closed (compared to the baseline and folded into it) once the newest line read is
+# REORDER_BUCKETS past it, so lines that arrive a little out of order still count. The
+# newest buckets stay open until the next run, python3 ClientRates.py --flush closes them.
+# Specify the directory containing your files
+directory = 'RAWLogs'
+state_file = 'ClientRates.state'
+alerts_file = 'ClientAlerts.txt'
+
+BUCKET_SECONDS = 300     # Size of a time bucket (5 minutes)
+ALPHA = 0.1              # EWMA weight of the newest bucket
+Z_THRESHOLD = 4.0        # Alert when a bucket is this many standard deviations above baseline
+MIN_BUCKETS = 12         # Don't alert until a client has this many buckets of history
+MIN_STDDEV = 1.0         # Floor for the standard deviation so quiet clients don't alert on 2 queries
+REORDER_BUCKETS = 2      # Buckets kept open behind the newest one for lines arriving late
+FINGERPRINT_BYTES = 4096  # Start of each log file hashed to notice it was rewritten
+flush = '--flush' in sys.argv[1:]
+
+# The client IP is the 10th space separated column (same as Step3.py 'cut -f 10')
+CLIENT_FIELD = 9
+
+# ===================== STATE =====================
+# Every client gets an integer id, and the per client values live in flat arrays
+# indexed by that id instead of one dict/object per client.
+clients = []       # id -> client ip
+client_ids = {}    # client ip -> id
+mean = array('d')  # EWMA of queries per bucket
+var = array('d')   # EWMA variance of queries per bucket
+seen = array('l')  # Number of buckets folded into the baseline
+bucket = array('q')  # Last bucket closed (folded into the baseline)
+window = {}        # client id -> {open bucket: queries so far}, only clients with open buckets
+newest = [-1]      # Newest bucket read from any file
+offsets = {}       # log file name -> [bytes processed, file size, fingerprint of its start, last time read]
+
+
+def load_state():
+    if not os.path.isfile(state_file):
+        return
+    with open(state_file, 'rb') as f:
+        header = json.loads(f.readline())
+        if header.get('bucket_seconds') != BUCKET_SECONDS or header.get('alpha') != ALPHA:
+            # Baselines counted with another bucket size or weight can't be continued
+            print(f'{state_file} was made with other BUCKET_SECONDS/ALPHA, starting over')
+            return
+        clients.extend(header['clients'])
+        offsets.update(header['offsets'])
+        n = len(clients)
+        for arr in (mean, var, seen, bucket):
+            arr.fromfile(f, n)
+        if 'window' in header:
+            for i, b, queries in header['window']:
+                window.setdefault(i, {})[b] = queries
+            newest[0] = header['newest']
+        else:
+            # Older state: one open bucket per client, saved after the bucket array
+            count = array('l')
+            count.fromfile(f, n)
+            for i in range(n):
+                if bucket[i] >= 0:
+                    window[i] = {bucket[i]: count[i]}
+                    newest[0] = max(newest[0], bucket[i])
+                    bucket[i] -= 1
+    client_ids.update((c, i) for i, c in enumerate(clients))
+
+
+def save_state():
+    tmp = state_file + '.tmp'
+    with open(tmp, 'wb') as f:
+        header = {'bucket_seconds': BUCKET_SECONDS, 'alpha': ALPHA,
+                  'clients': clients, 'offsets': offsets, 'newest': newest[0],
+                  'window': [[i, b, n] for i, open_buckets in window.items() for b, n in open_buckets.items()]}
+        f.write(json.dumps(header).encode() + b'\n')
+        for arr in (mean, var, seen, bucket):
+            arr.tofile(f)
+    os.replace(tmp, state_file)
+
+
+def intern(client):
+    i = client_ids.get(client)
+    if i is None:
+        i = len(clients)
+        client_ids[client] = i
+        clients.append(client)
+        mean.append(0.0)
+        var.append(0.0)
+        seen.append(0)
+        bucket.append(-1)
+    return i
+
+# ===================== EWMA =====================
+
+def fold(i, value):
+    # Standard incremental EWMA mean/variance update
+    diff = value - mean[i]
+    incr = ALPHA * diff
+    mean[i] += incr
+    var[i] = (1 - ALPHA) * (var[i] + diff * incr)
+    seen[i] += 1
+
+
+def close_bucket(i, b, n, alerts):
+    # Buckets with no queries at all since the last closed one still count towards the
+    # baseline. Folding in k zeros one at a time works out to:
+    #   mean * (1-a)^k   and   (1-a)^k * (var + mean^2 * (1 - (1-a)^k))
+    k = b - bucket[i] - 1 if bucket[i] >= 0 else 0
+    if k > 0:
+        decay = (1 - ALPHA) ** k
+        var[i] = decay * (var[i] + mean[i] * mean[i] * (1 - decay))
+        mean[i] *= decay
+        seen[i] += k
+    std = max(math.sqrt(var[i]), MIN_STDDEV)
+    z = (n - mean[i]) / std
+    if seen[i] >= MIN_BUCKETS and z >= Z_THRESHOLD:
+        alerts.append((b, clients[i], n, mean[i], z))
+    fold(i, n)
+    bucket[i] = b
+
+
+def close_until(until, alerts):
+    # Closes every open bucket up to and including until, oldest first per client
+    for i in list(window):
+        open_buckets = window[i]
+        for b in sorted(b for b in open_buckets if b <= until):
+            close_bucket(i, b, open_buckets.pop(b), alerts)
+        if not open_buckets:
+            del window[i]
+
+# ===================== PARSING =====================
+
+date_cache = {}
+
+
+def seconds_of(fields):
+    # Windows DNS debug lines start with: 3/14/2025 10:15:02 AM
+    day = date_cache.get(fields[0])
+    if day is None:
+        day = int(datetime.strptime(fields[0], '%m/%d/%Y').timestamp())
+        date_cache[fields[0]] = day
+    h, m, s = fields[1].split(':')
+    h = int(h) % 12
+    if fields[2] == 'PM':
+        h += 12
+    return day + h * 3600 + int(m) * 60 + int(s)
+
+
+def read_queries(file_path, start, progress, skip_until=-1):
+    # Yields (time, client) for the lines after byte start, lines at or before skip_until are
+    # skipped. progress is kept up to date as [bytes processed up to, latest time read].
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break  # Line still being written, pick it up next run
+            progress[0] += len(raw)
+            fields = raw.decode('utf-8', 'replace').split(' ')
+            if len(fields) <= CLIENT_FIELD or not fields[0][:1].isdigit():
+                continue  # Header or blank line
+            try:
+                seconds = seconds_of(fields)
+            except ValueError:
+                continue
+            if seconds <= skip_until:
+                continue  # Read before, the file was rewritten
+            progress[1] = max(progress[1], seconds)
+            yield seconds, fields[CLIENT_FIELD]
+
+
+def count_queries(queries, alerts):
+    # Counts (time, client) pairs into the open buckets, returns the lines that came too late
+    # (their bucket was already closed)
+    late = 0
+    for seconds, client in queries:
+        b = seconds // BUCKET_SECONDS
+        i = intern(client)
+        if b <= bucket[i]:
+            late += 1
+            continue
+        open_buckets = window.setdefault(i, {})
+        open_buckets[b] = open_buckets.get(b, 0) + 1
+        if b > newest[0]:
+            newest[0] = b
+            close_until(b - REORDER_BUCKETS - 1, alerts)
+    return late
+
+
+def fingerprint(file_path, length):
+    # Hash of the first length bytes, compared on the next run to notice a rewritten file
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def main():
+    load_state()
+    alerts = []
+
+    # Every file is read from where the last run stopped, all of them merged in time order
+    sources = []
+    progress = {}
+    for filename in sorted(os.listdir(directory)):
+        file_path = os.path.join(directory, filename)
+
+        # Check if it's a file (not a subdirectory)
+        if os.path.isfile(file_path):
+            size = os.path.getsize(file_path)
+            done, _, mark, latest = (offsets.get(filename, []) + [0, 0, '', -1])[:4]
+            skip_until = -1
+            if done and (size < done or (mark and fingerprint(file_path, min(done, FINGERPRINT_BYTES)) != mark)):
+                # File was truncated, rewritten or replaced, start over past what was read
+                done, skip_until = 0, latest
+            if size == done:
+                continue
+            progress[filename] = [done, latest, size]
+            sources.append(read_queries(file_path, done, progress[filename], skip_until))
+
+    late = count_queries(heapq.merge(*sources), alerts)
+    if flush:
+        close_until(newest[0], alerts)
+
+    for filename, (done, latest, size) in progress.items():
+        # Fingerprint of what was read, so it can be compared while the file grows
+        file_path = os.path.join(directory, filename)
+        offsets[filename] = [done, size, fingerprint(file_path, min(done, FINGERPRINT_BYTES)), latest]
+        print(f'Processed {filename}')
+
+    save_state()
+
+    with open(alerts_file, 'a') as out_file:
+        for b, client, n, avg, z in sorted(alerts):
+            when = datetime.fromtimestamp(b * BUCKET_SECONDS).strftime('%Y-%m-%d %H:%M')
+            line = f'{when} {client} {n} queries (baseline {avg:.1f}, z={z:.1f})'
+            out_file.write(line + '\n')
+            print(f'ALERT {line}')
+
+    if late:
+        print(f'{late} lines were older than buckets already closed and not counted')
+    open_count = sum(len(b) for b in window.values())
+    print(f'{len(clients)} clients tracked, {len(alerts)} alerts, {open_count} buckets left open for the next run')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,64 @@
 import os
+import sys
 import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Log_Tools'))
+import timeindex
 # This gets the Column We need which is the 7th Column, from all of the Files and Creates the SVC2.txt File
 # Specify the directory containing your files
 directory = 'RAWLogs'
 output_file = 'Output.txt'
 
+# Optional: only the files with log lines between two dates (YYYY-MM-DD), the rest are skipped
+# i.e. python3 Step3.py 2025-03-14 2025-03-14
+date_from, date_to = (sys.argv[1], sys.argv[2]) if len(sys.argv) == 3 else (None, None)
+index = timeindex.TimeIndex()
+
+# Written by Step1.py --keep: where the log data starts in each file. An offset is only used
+# while the file still has the size and modification time it had then, a file that was
+# stripped or replaced since has no header to skip (or another one).
+header_offsets = {}
+offsets_file = os.path.join(directory, '.header_offsets')
+if os.path.isfile(offsets_file):
+    with open(offsets_file, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 4:
+                continue  # Saved by an older Step1.py, without the size to check it against
+            name, offset, size, mtime = fields
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            if stat.st_size == int(size) and int(stat.st_mtime) == int(mtime):
+                header_offsets[name] = int(offset)
+
 # Open the output file in append mode
 with open(output_file, 'a') as out_file:
     # Loop through all files in the directory
     for filename in os.listdir(directory):
         file_path = os.path.join(directory, filename)
 
-        # Check if it's a file (not a subdirectory)
-        if os.path.isfile(file_path):
+        # Check if it's a file (not a subdirectory, or the .header_offsets file)
+        if os.path.isfile(file_path) and not filename.startswith('.'):
+            if date_from and not timeindex.overlaps(index.span(file_path, 'dns'), date_from, date_to):
+                continue
             # Run the 'cut' command using subprocess
             try:
-                result = subprocess.run(
-                    ['cut', '-d', ' ', '-f', '10', file_path],
-                    text=True, capture_output=True, check=True
-                )
-                # Append the result to the output file
-                out_file.write(result.stdout)
+                cut = ['cut', '-d', ' ', '-f', '10']
+                if filename in header_offsets:
+                    # Start reading after the header (tail -c seeks there), the file is never rewritten
+                    tail = subprocess.Popen(['tail', '-c', f'+{header_offsets[filename] + 1}', file_path],
+                                            stdout=subprocess.PIPE)
+                    result = subprocess.run(cut, stdin=tail.stdout, text=True, capture_output=True, check=True)
+                    tail.stdout.close()
+                    tail.wait()
+                else:
+                    result = subprocess.run(cut + [file_path], text=True, capture_output=True, check=True)
+                # Append the result to the output file, leaving out blank lines
+                # (Step2.sh removes them, but not from files kept as they are by Step1.py --keep)
+                out_file.writelines(line for line in result.stdout.splitlines(True) if line.strip())
                 print(f'Processed {filename}')
             except subprocess.CalledProcessError as e:
                 print(f"Error processing {filename}: {e}")
+
+index.save()
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 
-import requests
 import sys
 import time
 import json
 import os
 import re
 import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import hexclient
+import resultcache
+import condensers
+import context as ctx
+
 # ===================== DEFAULTS =====================
 
 DEFAULT_OLLAMA_URL = "http://localhost:11434"
@@ -19,11 +26,67 @@ MAX_CYCLES = 6
 SLEEP_BETWEEN_CYCLES = 1.5
 
 VERBOSE_LLM = True
+STREAM_OUTPUT = True   # print responses as they are generated (off when calls run side by side)
+
+# EXECUTE and ANALYZE continue the PLAN call's conversation (Ollama's returned context), so
+# Ollama only evaluates the new part of the prompt instead of the whole system prompt,
+# objective and facts again.
+CONTEXT_REUSE = True
+
+# How long Ollama keeps the model loaded after a call ("30m", "2h", -1 = until Ollama stops),
+# set AGENT_KEEP_ALIVE to change it. The model is loaded while the tools are discovered and
+# pinged every PING_INTERVAL seconds while Hexstrike commands run, so it is never unloaded
+# in the middle of an engagement.
+KEEP_ALIVE = os.environ.get("AGENT_KEEP_ALIVE", "30m")
+if KEEP_ALIVE.lstrip("-").isdigit():
+    KEEP_ALIVE = int(KEEP_ALIVE)  # a plain number is seconds
+PING_INTERVAL = 120
 MEMORY_FILE = "agent_memory.json"
 EVIDENCE_DIR = "evidence"
 
 HEX_PATTERN = re.compile(r"^!hex\s+(.+)$", re.IGNORECASE)
 
+# EXECUTE can ask for several commands at once, they run side by side in Hexstrike.
+# MAX_THREADS caps all running commands (like SCOPE max_threads in archive/v2.py),
+# TOOL_THREADS caps single tools, heavy scanners get 1.
+MAX_COMMANDS = 5
+MAX_THREADS = 4
+DEFAULT_TOOL_THREADS = 2
+TOOL_THREADS = {
+    "nuclei": 1,
+    "nikto": 1,
+    "sqlmap": 1,
+    "gobuster": 1,
+}
+
+# Results of Hexstrike commands are kept in cache/ (see resultcache.py) and reused while they
+# are fresh (TTLS per tool there), so the same scan isn't run again in a later cycle or run.
+RESULT_CACHE = True
+
+# One call for PLAN and EXECUTE together: the model answers with JSON (plan, commands, done)
+# that Ollama holds to a schema listing the available tools, so no regex parsing of !hex
+# lines and one LLM call less per cycle.
+FUSED_PLAN_EXECUTE = False
+
+# Tool output is condensed (see condensers.py) before it goes to ANALYZE: nmap, nuclei,
+# whatweb, httpx, gobuster and nikto are parsed into short findings, which also go straight
+# into memory["facts"]. Commands for those tools get their machine readable output flag
+# (nmap -oX -, nuclei -jsonl, httpx -json, whatweb -q --log-json=-) added. Evidence keeps the raw output.
+CONDENSE_OUTPUT = True
+
+# Token budgets (estimated, see context.py) for the memory put into prompts: facts and the
+# last PLAN_NOTES notes in PLAN, evidence and notes in the report. What doesn't fit is left
+# out by priority and age, and printed.
+PLAN_BUDGET = 2000
+REPORT_BUDGET = 6000
+PLAN_NOTES = 3
+
+# Ollama options per phase. EXECUTE only needs a few short lines, so it is capped and also
+# cut off (execute_done) as soon as the commands are complete.
+PHASE_OPTIONS = {
+    "EXECUTE": {"num_predict": 48 * MAX_COMMANDS},
+}
+
 os.makedirs(EVIDENCE_DIR, exist_ok=True)
 
 OLLAMA_URL = None
@@ -71,9 +134,9 @@ def hash_file(path):
 
 # ===================== MEMORY =====================
 
-def load_memory(objective):
+def load_memory(objective, path=MEMORY_FILE):
     try:
-        with open(MEMORY_FILE, "r") as f:
+        with open(path, "r") as f:
             mem = json.load(f)
             if mem.get("objective") == objective:
                 return mem
@@ -90,48 +153,145 @@ def load_memory(objective):
     }
 
 
-def save_memory(memory):
+def save_memory(memory, path=MEMORY_FILE):
     memory["last_updated"] = datetime.utcnow().isoformat()
-    with open(MEMORY_FILE, "w") as f:
+    with open(path, "w") as f:
         json.dump(memory, f, indent=2)
 
 # ===================== OLLAMA =====================
 
 def get_models():
-    r = requests.get(f"{OLLAMA_URL}/api/tags", timeout=TIMEOUT)
+    r = hexclient.get(f"{OLLAMA_URL}/api/tags", read_timeout=TIMEOUT)
     r.raise_for_status()
     return r.json()["models"]
 
 
-def ollama_generate(model, system, prompt, label=""):
+def warm_model(model):
+    # An empty prompt loads the model (or keeps it loaded) without generating anything
+    r = hexclient.post(
+        f"{OLLAMA_URL}/api/generate",
+        json={"model": model, "prompt": "", "keep_alive": KEEP_ALIVE},
+        read_timeout=600
+    )
+    r.raise_for_status()
+
+
+def start_warmup(model):
+    # Loads the model in the background, the first PLAN call no longer pays for it
+    def warm():
+        started = time.time()
+        try:
+            warm_model(model)
+            print(f"\n[+] Model {model} loaded in {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"\n[!] Model warmup failed: {e}")
+
+    t = threading.Thread(target=warm, daemon=True)
+    t.start()
+    return t
+
+
+@contextmanager
+def keep_warm(model):
+    # Pings the model while a long Hexstrike command runs, so it stays loaded
+    stop = threading.Event()
+
+    def ping():
+        while not stop.wait(PING_INTERVAL):
+            try:
+                warm_model(model)
+            except Exception:
+                pass
+
+    t = threading.Thread(target=ping, daemon=True)
+    t.start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+def is_command(line):
+    line = line.strip()
+    return bool(HEX_PATTERN.match(line)) or line.upper() == "NO TOOL"
+
+
+def execute_done(text):
+    # EXECUTE is complete once NO TOOL or MAX_COMMANDS !hex lines have arrived, or when a
+    # finished line after the commands is something else (the model started explaining).
+    # Blank lines don't count, some models start with one.
+    lines = text.split("\n")
+    if lines[-1].strip().upper() == "NO TOOL":
+        return True
+    commands = 0
+    for line in lines[:-1]:  # the last line may still be arriving
+        line = line.strip()
+        if line.upper() == "NO TOOL":
+            return True
+        if HEX_PATTERN.match(line):
+            commands += 1
+        elif line and commands:
+            return True
+    return commands >= MAX_COMMANDS
+
+
+def execute_trim(text):
+    # Drops whatever the model added after the last command (an explanation)
+    lines = text.split("\n")
+    last = max((i for i, line in enumerate(lines) if is_command(line)), default=None)
+    return text if last is None else "\n".join(lines[:last + 1])
+
+
+def ollama_call(model, system, prompt, label="", phase="", context=None, fmt=None):
+    # Streamed, printed as it arrives with STREAM_OUTPUT. phase picks the PHASE_OPTIONS.
+    # Returns (response, context). Giving that context to the next call continues the same
+    # conversation, the system prompt is already in it so it isn't sent again.
+    # fmt is Ollama's format: "json" or a JSON schema the response has to follow.
     if VERBOSE_LLM:
         print("\n" + "=" * 90)
         print(f"📤 LLM REQUEST [{label}]")
         print("-" * 90)
         print(prompt)
         print("=" * 90)
-
-    r = requests.post(
-        f"{OLLAMA_URL}/api/generate",
-        json={
-            "model": model,
-            "system": system,
-            "prompt": prompt,
-            "stream": False
-        },
-        timeout=300
+        if STREAM_OUTPUT:
+            print("\n" + "=" * 90)
+            print(f"📥 LLM RESPONSE [{label}]")
+            print("-" * 90)
+
+    def chunk(text):
+        if VERBOSE_LLM and STREAM_OUTPUT:
+            print(text, end="", flush=True)
+
+    payload = {
+        "model": model,
+        "system": "" if context else system,
+        "prompt": prompt,
+        "keep_alive": KEEP_ALIVE,
+    }
+    if context:
+        payload["context"] = context
+    if fmt:
+        payload["format"] = fmt
+    if phase in PHASE_OPTIONS:
+        payload["options"] = PHASE_OPTIONS[phase]
+    text, final = hexclient.ollama_stream(
+        OLLAMA_URL, payload, on_chunk=chunk,
+        cutoff=execute_done if phase == "EXECUTE" else None
     )
-    r.raise_for_status()
-    response = r.json()["response"].strip()
+    response = (execute_trim(text) if phase == "EXECUTE" else text).strip()
 
     if VERBOSE_LLM:
-        print("\n" + "=" * 90)
-        print(f"📥 LLM RESPONSE [{label}]")
-        print("-" * 90)
-        print(response)
-        print("=" * 90)
+        if STREAM_OUTPUT:
+            print("\n" + "=" * 90)
+        else:
+            print("\n" + "=" * 90)
+            print(f"📥 LLM RESPONSE [{label}]")
+            print("-" * 90)
+            print(response)
+            print("=" * 90)
 
-    return response
+    # No context when EXECUTE was cut off before Ollama finished
+    return response, final.get("context")
 
 
 def ollama_generate_stream(model, system, prompt, label=""):
@@ -139,26 +299,11 @@ def ollama_generate_stream(model, system, prompt, label=""):
     print(f"📤 LLM STREAM [{label}]")
     print("=" * 90)
 
-    r = requests.post(
-        f"{OLLAMA_URL}/api/generate",
-        json={
-            "model": model,
-            "system": system,
-            "prompt": prompt,
-            "stream": True
-        },
-        stream=True
+    full, _ = hexclient.ollama_stream(
+        OLLAMA_URL,
+        {"model": model, "system": system, "prompt": prompt, "keep_alive": KEEP_ALIVE},
+        on_chunk=lambda chunk: print(chunk, end="", flush=True)
     )
-    r.raise_for_status()
-
-    full = ""
-    for line in r.iter_lines():
-        if not line:
-            continue
-        data = json.loads(line.decode())
-        chunk = data.get("response", "")
-        print(chunk, end="", flush=True)
-        full += chunk
 
     print("\n" + "=" * 90)
     return full
@@ -166,7 +311,7 @@ def ollama_generate_stream(model, system, prompt, label=""):
 # ===================== HEXSTRIKE =====================
 
 def discover_hexstrike_tools():
-    r = requests.get(f"{HEXSTRIKE_URL}/health", timeout=TIMEOUT)
+    r = hexclient.get(f"{HEXSTRIKE_URL}/health", read_timeout=TIMEOUT)
     r.raise_for_status()
     tools_status = r.json().get("tools_status", {})
     tools = sorted(t for t, ok in tools_status.items() if ok)
@@ -179,15 +324,17 @@ def discover_hexstrike_tools():
 
 
 def execute_hexstrike(cmd):
+    # (output, ok). ok is False when Hexstrike reports the command failed or timed out
     print(f"\n⚙️ EXECUTING:\n{cmd}\n")
-    r = requests.post(
+    r = hexclient.post(
         f"{HEXSTRIKE_URL}/api/command",
         json={"command": cmd},
-        timeout=300
+        read_timeout=300
     )
-    if r.status_code == 200:
-        return r.json().get("output", "")
-    return f"HTTP error {r.status_code}"
+    if r.status_code != 200:
+        return f"HTTP error {r.status_code}", False
+    data = r.json()
+    return data.get("output", ""), data.get("success", True) is not False and not data.get("timed_out")
 
 # ===================== PROMPTS =====================
 
@@ -203,7 +350,7 @@ PLAN:
 - NO commands
 
 EXECUTE:
-- Output ONE line only
+- Output one line per command, up to {MAX_COMMANDS} commands that can run at the same time
 - !hex <tool> <args> OR NO TOOL
 
 ANALYZE:
@@ -221,74 +368,106 @@ TOOLS:
 {", ".join(tools)}
 """
 
-# ===================== AGENT =====================
+def plan_prompt(objective, memory, last_step="", phase="PLAN", ask="Describe the NEXT step."):
+    # last_step: the last command and its output, for a PLAN made before its ANALYZE is done.
+    # What changes least comes first (objective, facts that are only ever added to, then the
+    # latest notes), so each cycle's prompt starts the same way and Ollama's prompt cache
+    # can reuse as much of it as possible. Facts and notes are packed into PLAN_BUDGET tokens.
+    notes = memory["notes"][-PLAN_NOTES:]
+    known, dropped = ctx.assemble([
+        ("Known Facts", [(ctx.fact_priority(f), f) for f in memory["facts"]]),
+        ("Notes", [(0 if i == len(notes) - 1 else 1, n) for i, n in enumerate(notes)]),
+    ], PLAN_BUDGET)
+    if dropped:
+        print(ctx.describe(dropped, PLAN_BUDGET))
+    return f"""
+=== PHASE: {phase} ===
 
-def run_agent(model, tools):
-    system = build_system_prompt(tools)
-    objective = input("\n🎯 Objective: ").strip()
-    memory = load_memory(objective)
+Objective:
+{objective}
 
-    last_prompt = None
+{known}
+{last_step}
+{ask}
+"""
 
-    for cycle in range(1, MAX_CYCLES + 1):
-        print(f"\n===== CYCLE {cycle} =====")
 
-        plan_prompt = f"""
-=== PHASE: PLAN ===
+def fused_prompt(objective, memory, last_step=""):
+    return plan_prompt(objective, memory, last_step, "PLAN + EXECUTE", f"""Describe the NEXT step and the commands for it, as JSON:
+- plan: the next step
+- commands: up to {MAX_COMMANDS} commands to run at the same time, each a tool and its arguments (empty for NO TOOL)
+- done: true if the objective is already met""")
 
-Objective:
-{objective}
 
-Known Facts:
-{chr(10).join(memory['facts'])}
+def fused_schema(tools):
+    # The commands can only name available tools (an empty enum would match nothing, so
+    # without tools any name is accepted and parse_fused drops it)
+    tool = {"type": "string", "enum": list(tools)} if tools else {"type": "string"}
+    return {
+        "type": "object",
+        "properties": {
+            "plan": {"type": "string"},
+            "commands": {
+                "type": "array",
+                "maxItems": MAX_COMMANDS,
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "tool": tool,
+                        "args": {"type": "string"},
+                    },
+                    "required": ["tool", "args"],
+                },
+            },
+            "done": {"type": "boolean"},
+        },
+        "required": ["plan", "commands", "done"],
+    }
 
-Notes:
-{chr(10).join(memory['notes'][-3:])}
 
-Describe the NEXT step.
-"""
-        print_prompt_diff(last_prompt, plan_prompt, "PLAN")
-        plan = ollama_generate(model, system, plan_prompt, "PLAN")
+def parse_fused(answer, tools):
+    # (plan, EXECUTE text, done) from the JSON answer, commands are checked against the tool list
+    try:
+        data = json.loads(answer)
+    except ValueError:
+        return answer, "NO TOOL", False
+    if not isinstance(data, dict):
+        return answer, "NO TOOL", False
+    plan = str(data.get("plan", ""))
+    lines = []
+    for c in data.get("commands") or []:
+        if not isinstance(c, dict) or c.get("tool") not in tools:
+            continue
+        line = f"!hex {c['tool']} {str(c.get('args', '')).strip()}".strip()
+        if "\n" not in line and line not in lines:
+            lines.append(line)
+    return plan, "\n".join(lines[:MAX_COMMANDS]) or "NO TOOL", data.get("done") is True
 
-        execute_prompt = f"""
-=== PHASE: EXECUTE ===
 
+def execute_prompt(plan, chained=False):
+    # chained: continues the PLAN conversation, which already has the plan in it
+    plan_text = "" if chained else f"""
 PLAN:
 {plan}
-
-Output ONLY:
+"""
+    return f"""
+=== PHASE: EXECUTE ===
+{plan_text}
+Output ONLY (one line per command, up to {MAX_COMMANDS}):
 !hex <tool> <args>
 OR
 NO TOOL
 """
-        print_prompt_diff(plan_prompt, execute_prompt, "EXECUTE")
-        execute = ollama_generate(model, system, execute_prompt, "EXECUTE").strip()
-
-        tool_output = "NO TOOL"
-        tool_used = None
-
-        if execute != "NO TOOL":
-            m = HEX_PATTERN.match(execute)
-            if m:
-                cmd = m.group(1)
-                tool = cmd.split()[0]
-                if tool in tools:
-                    tool_used = tool
-                    memory["tools_used"].append(tool)
-                    tool_output = execute_hexstrike(cmd)
-                    memory["evidence"].append({
-                        "type": "command_output",
-                        "tool": tool,
-                        "excerpt": tool_output[:1000],
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
 
-        analyze_prompt = f"""
-=== PHASE: ANALYZE ===
 
+def analyze_prompt(plan, execute, tool_output, chained=False):
+    plan_text = "" if chained else f"""
 PLAN:
 {plan}
-
+"""
+    return f"""
+=== PHASE: ANALYZE ===
+{plan_text}
 EXECUTE:
 {execute}
 
@@ -298,20 +477,185 @@ OUTPUT:
 Include:
 CONFIDENCE: <0.0–1.0>
 """
-        print_prompt_diff(execute_prompt, analyze_prompt, "ANALYZE")
-        analysis = ollama_generate(model, system, analyze_prompt, "ANALYZE")
 
-        confidence = extract_confidence(analysis)
-        print(f"🔐 Confidence: {confidence}")
+# ===================== AGENT =====================
+
+_SLOTS = {}
+_SLOTS_LOCK = threading.Lock()
+
+
+def tool_slots(tool):
+    # (slot for this tool, slot out of MAX_THREADS), shared by every cycle and objective
+    with _SLOTS_LOCK:
+        if "*" not in _SLOTS:
+            _SLOTS["*"] = threading.BoundedSemaphore(MAX_THREADS)
+        if tool not in _SLOTS:
+            _SLOTS[tool] = threading.BoundedSemaphore(TOOL_THREADS.get(tool, DEFAULT_TOOL_THREADS))
+        return _SLOTS[tool], _SLOTS["*"]
+
+
+def execute_limited(cmd):
+    tool_slot, all_slot = tool_slots(cmd.split()[0])
+    with tool_slot, all_slot:
+        return execute_hexstrike(cmd)
+
 
-        memory["notes"].append(analysis[:300])
-        save_memory(memory)
+_CACHE = []
+_CACHE_LOCK = threading.Lock()
 
-        if "DONE" in analysis.upper() and confidence >= 0.9:
+
+def result_cache():
+    # Created on first use, from whichever run_tools worker thread gets there first
+    with _CACHE_LOCK:
+        if not _CACHE:
+            _CACHE.append(resultcache.ResultCache())
+        return _CACHE[0]
+
+
+def execute_cached(cmd):
+    # (output, time it was run if it came from the cache, else None)
+    if RESULT_CACHE:
+        hit = result_cache().get(cmd)
+        if hit:
+            print(f"\n♻️ CACHED:\n{cmd}\n")
+            return hit
+    output, ok = execute_limited(cmd)
+    if RESULT_CACHE:
+        result_cache().put(cmd, output, ok)
+    return output, None
+
+
+def execute_safe(cmd):
+    # execute_cached, with an error (Hexstrike unreachable, bad response) as the output of
+    # this command only, so the other commands running with it keep their results
+    try:
+        return execute_cached(cmd)
+    except Exception as e:
+        print(f"\n❌ FAILED:\n{cmd}\n{type(e).__name__}: {e}\n")
+        return f"Error running command: {type(e).__name__}: {e}", None
+
+
+def parse_commands(execute, tools):
+    # The !hex lines from EXECUTE for available tools, duplicates dropped
+    commands = []
+    for line in execute.splitlines():
+        m = HEX_PATTERN.match(line.strip())
+        if m and m.group(1).split()[0] in tools and m.group(1) not in commands:
+            commands.append(m.group(1))
+    return commands[:MAX_COMMANDS]
+
+
+def run_tools(execute, tools, memory):
+    # Runs the !hex lines from EXECUTE at the same time, returns (combined output, tools used)
+    commands = parse_commands(execute, tools)
+    if not commands:
+        return "NO TOOL", []
+    if CONDENSE_OUTPUT:
+        commands = [condensers.machine_command(cmd) for cmd in commands]
+
+    with ThreadPoolExecutor(max_workers=len(commands)) as pool:
+        results = list(pool.map(execute_safe, commands))
+
+    used = []
+    outputs = []
+    for cmd, (tool_output, cached) in zip(commands, results):
+        tool = cmd.split()[0]
+        used.append(tool)
+        memory["tools_used"].append(tool)
+        evidence = {
+            "type": "command_output",
+            "tool": tool,
+            "command": cmd,
+            "excerpt": tool_output[:1000],
+            "timestamp": datetime.utcnow().isoformat(),
+            "cached": cached is not None,
+        }
+        if cached:
+            run_at = datetime.utcfromtimestamp(cached).isoformat()
+            evidence["cached_from"] = run_at
+        if CONDENSE_OUTPUT:
+            condensed, facts = condensers.condense(tool, tool_output)
+            if facts:
+                evidence["findings"] = facts
+            if tool in condensers.MACHINE_FLAGS:
+                # The start of nmap XML / JSON lines is boilerplate, the parsed summary (or
+                # the end of the output when nothing was parsed) is the useful part
+                evidence["excerpt"] = condensed[:1000] if facts else tool_output[-1000:]
+            tool_output = condensed
+            for fact in facts:
+                if fact not in memory["facts"]:
+                    memory["facts"].append(fact)
+        if cached:
+            tool_output = f"[cached result from {evidence['cached_from']} UTC]\n{tool_output}"
+        memory["evidence"].append(evidence)
+        outputs.append(tool_output)
+
+    if len(commands) == 1:
+        return outputs[0], used
+    return "\n\n".join(f"### !hex {cmd}\n{out}" for cmd, out in zip(commands, outputs)), used
+
+
+def finish_objective(memory, plan, path=MEMORY_FILE):
+    # The fused answer says the objective is met: no commands and no ANALYZE, just the note
+    print("🏁 Model reports the objective is met")
+    memory["notes"].append(f"DONE: {plan}"[:300])
+    save_memory(memory, path)
+
+
+def finish_cycle(memory, analysis, path=MEMORY_FILE):
+    # Saves the analysis, returns True when the objective is done
+    confidence = extract_confidence(analysis)
+    print(f"🔐 Confidence: {confidence}")
+
+    memory["notes"].append(analysis[:300])
+    save_memory(memory, path)
+    return "DONE" in analysis.upper() and confidence >= 0.9
+
+
+def run_agent(model, tools):
+    system = build_system_prompt(tools)
+    objective = input("\n🎯 Objective: ").strip()
+    memory = load_memory(objective)
+
+    last_prompt = None
+
+    for cycle in range(1, MAX_CYCLES + 1):
+        print(f"\n===== CYCLE {cycle} =====")
+
+        if FUSED_PLAN_EXECUTE:
+            plan_text = fused_prompt(objective, memory)
+            print_prompt_diff(last_prompt, plan_text, "PLAN + EXECUTE")
+            answer, context = ollama_call(model, system, plan_text, "PLAN+EXECUTE", "PLAN+EXECUTE",
+                                           fmt=fused_schema(tools))
+            context = context if CONTEXT_REUSE else None
+            plan, execute, done = parse_fused(answer, tools)
+            if done:
+                finish_objective(memory, plan)
+                break
+            execute_text = plan_text
+        else:
+            plan_text = plan_prompt(objective, memory)
+            print_prompt_diff(last_prompt, plan_text, "PLAN")
+            plan, context = ollama_call(model, system, plan_text, "PLAN", "PLAN")
+            context = context if CONTEXT_REUSE else None
+
+            execute_text = execute_prompt(plan, chained=bool(context))
+            print_prompt_diff(plan_text, execute_text, "EXECUTE")
+            execute = ollama_call(model, system, execute_text, "EXECUTE", "EXECUTE", context=context)[0].strip()
+
+        with keep_warm(model):
+            tool_output, tools_used = run_tools(execute, tools, memory)
+
+        # Continues from the PLAN too, EXECUTE's own context is gone when it was cut off early
+        analyze_text = analyze_prompt(plan, execute, tool_output, chained=bool(context))
+        print_prompt_diff(execute_text, analyze_text, "ANALYZE")
+        analysis = ollama_call(model, system, analyze_text, "ANALYZE", "ANALYZE", context=context)[0]
+
+        if finish_cycle(memory, analysis):
             print("✅ Objective completed with high confidence")
             break
 
-        last_prompt = plan_prompt
+        last_prompt = plan_text
         time.sleep(SLEEP_BETWEEN_CYCLES)
 
     return memory
@@ -319,6 +663,13 @@ CONFIDENCE: <0.0–1.0>
 # ===================== REPORT =====================
 
 def generate_report(model, memory):
+    # Evidence with the worst findings and the latest notes first, within REPORT_BUDGET tokens
+    body, dropped = ctx.assemble([
+        ("Evidence", [ctx.evidence_item(e) for e in memory["evidence"]]),
+        ("Notes", [(1, n) for n in memory["notes"]]),
+    ], REPORT_BUDGET)
+    if dropped:
+        print(ctx.describe(dropped, REPORT_BUDGET))
     prompt = f"""
 Generate a professional cybersecurity report.
 
@@ -328,11 +679,7 @@ Objective:
 Tools Used:
 {', '.join(set(memory['tools_used']))}
 
-Evidence:
-{json.dumps(memory['evidence'], indent=2)}
-
-Notes:
-{chr(10).join(memory['notes'])}
+{body}
 
 Sections:
 - Executive Summary
@@ -353,7 +700,6 @@ def main():
     HEXSTRIKE_URL = prompt_url("Hexstrike URL", DEFAULT_HEXSTRIKE_URL)
     OLLAMA_URL = prompt_url("Ollama URL", DEFAULT_OLLAMA_URL)
 
-    tools = discover_hexstrike_tools()
     models = get_models()
 
     print("\nAvailable Ollama models:")
@@ -362,6 +708,10 @@ def main():
 
     model = models[int(input("\nSelect model: ")) - 1]["name"]
 
+    # The model loads while the tools are discovered and the objective is typed in
+    start_warmup(model)
+    tools = discover_hexstrike_tools()
+
     memory = run_agent(model, tools)
 
     print("\n📝 GENERATING FINAL REPORT\n")
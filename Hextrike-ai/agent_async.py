@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import asyncio
+import hashlib
+
+import agent
+
+# Asyncio version of the agent loop in agent.py (same prompts, memory and report).
+#
+# - Several objectives run side by side in one process, each with its own memory file.
+# - While the model ANALYZEs a result, the PLAN for the next cycle is already being worked
+#   out from the same result (PIPELINE), so the model server never sits idle waiting for us.
+#   If the analysis says DONE the early plan is thrown away.
+# - No sleep between cycles, waiting is done on the model and Hexstrike only.
+#
+# The HTTP calls are the pooled hexclient.py ones run in worker threads (asyncio.to_thread),
+# which needs nothing beyond requests. LLM_CONCURRENCY should match how many requests the
+# Ollama server runs at once (OLLAMA_NUM_PARALLEL), extra ones just queue here. Hexstrike
+# commands from all objectives share the MAX_THREADS / TOOL_THREADS limits in agent.py.
+
+# ===================== DEFAULTS =====================
+
+LLM_CONCURRENCY = 2
+PIPELINE = True
+LAST_OUTPUT_CHARS = 2000   # of the tool output given to an early PLAN
+
+# ===================== ASYNC CALLS =====================
+
+async def generate(llm, model, system, prompt, label, phase, context=None, fmt=None):
+    # (response, context), see agent.ollama_call
+    async with llm:
+        call = asyncio.ensure_future(asyncio.to_thread(agent.ollama_call, model, system, prompt, label, phase, context, fmt))
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            # Cancelling (an early PLAN thrown away) can't stop the thread, the HTTP call
+            # carries on. Its llm slot is only given back once it is over, so there are
+            # never more than LLM_CONCURRENCY calls on the model server.
+            await asyncio.wait([call])
+            raise
+
+
+async def plan_step(llm, model, system, tools, objective, memory, label, last_step=""):
+    # (plan, EXECUTE text or None, context, done). With FUSED_PLAN_EXECUTE one call gives
+    # both, and done is True when the model says the objective is already met.
+    if agent.FUSED_PLAN_EXECUTE:
+        answer, context = await generate(llm, model, system, agent.fused_prompt(objective, memory, last_step),
+                                         f"{label} PLAN+EXECUTE", "PLAN+EXECUTE", fmt=agent.fused_schema(tools))
+        plan, execute, done = agent.parse_fused(answer, tools)
+        return plan, execute, context, done
+    plan, context = await generate(llm, model, system, agent.plan_prompt(objective, memory, last_step),
+                                   f"{label} PLAN", "PLAN")
+    return plan, None, context, False
+
+
+async def run_tools(model, execute, tools, memory):
+    def run():
+        with agent.keep_warm(model):
+            return agent.run_tools(execute, tools, memory)
+    return await asyncio.to_thread(run)
+
+
+def memory_path(objective, count):
+    # One objective keeps agent_memory.json, several get one file each
+    if count == 1:
+        return agent.MEMORY_FILE
+    digest = hashlib.sha256(objective.encode()).hexdigest()[:8]
+    return f"agent_memory_{digest}.json"
+
+# ===================== AGENT =====================
+
+async def run_objective(n, objective, model, tools, llm, path):
+    system = agent.build_system_prompt(tools)
+    memory = agent.load_memory(objective, path)
+    label = f"#{n}"
+
+    plan, execute, context, done = await plan_step(llm, model, system, tools, objective, memory, label)
+
+    for cycle in range(1, agent.MAX_CYCLES + 1):
+        print(f"\n===== {label} CYCLE {cycle} =====")
+        if done:
+            agent.finish_objective(memory, plan, path)
+            break
+
+        context = context if agent.CONTEXT_REUSE else None
+        if execute is None:
+            execute, _ = await generate(llm, model, system, agent.execute_prompt(plan, chained=bool(context)),
+                                        f"{label} EXECUTE", "EXECUTE", context)
+            execute = execute.strip()
+        tool_output, _ = await run_tools(model, execute, tools, memory)
+
+        analyze = asyncio.create_task(generate(
+            llm, model, system, agent.analyze_prompt(plan, execute, tool_output, chained=bool(context)),
+            f"{label} ANALYZE", "ANALYZE", context))
+
+        next_plan = None
+        if PIPELINE and cycle < agent.MAX_CYCLES:
+            last_step = f"\nLast Step:\n{execute}\n\nLast Output:\n{tool_output[:LAST_OUTPUT_CHARS]}\n"
+            next_plan = asyncio.create_task(plan_step(
+                llm, model, system, tools, objective, memory, label, last_step))
+
+        analysis, _ = await analyze
+        if agent.finish_cycle(memory, analysis, path):
+            print(f"✅ {label} Objective completed with high confidence")
+            if next_plan:
+                next_plan.cancel()
+            break
+
+        if cycle < agent.MAX_CYCLES:
+            if next_plan:
+                plan, execute, context, done = await next_plan
+            else:
+                plan, execute, context, done = await plan_step(llm, model, system, tools, objective, memory, label)
+
+    return memory
+
+
+async def run_all(model, tools, objectives):
+    llm = asyncio.Semaphore(LLM_CONCURRENCY)
+    return await asyncio.gather(*(
+        run_objective(n, objective, model, tools, llm, memory_path(objective, len(objectives)))
+        for n, objective in enumerate(objectives, 1)
+    ))
+
+# ===================== MAIN =====================
+
+def main():
+    print("\n🔧 Configure Endpoints (Enter = default)\n")
+    agent.HEXSTRIKE_URL = agent.prompt_url("Hexstrike URL", agent.DEFAULT_HEXSTRIKE_URL)
+    agent.OLLAMA_URL = agent.prompt_url("Ollama URL", agent.DEFAULT_OLLAMA_URL)
+
+    models = agent.get_models()
+
+    print("\nAvailable Ollama models:")
+    for i, m in enumerate(models, 1):
+        print(f"{i}. {m['name']}")
+
+    model = models[int(input("\nSelect model: ")) - 1]["name"]
+
+    # The model loads while the tools are discovered and the objectives are typed in
+    agent.start_warmup(model)
+    tools = agent.discover_hexstrike_tools()
+
+    print("\n🎯 Objectives (one per line, empty line to start):")
+    objectives = []
+    while True:
+        line = input("> ").strip()
+        if not line:
+            break
+        objectives.append(line)
+    if not objectives:
+        return
+
+    if len(objectives) > 1:
+        # Full prompts from several objectives at once can't be followed anyway
+        agent.VERBOSE_LLM = False
+    # Calls run side by side, so responses are printed whole instead of streamed
+    agent.STREAM_OUTPUT = False
+
+    memories = asyncio.run(run_all(model, tools, objectives))
+
+    for n, memory in enumerate(memories, 1):
+        print(f"\n📝 GENERATING FINAL REPORT #{n}\n")
+        report = agent.generate_report(model, memory)
+        path = "final_report.md" if len(memories) == 1 else f"final_report_{n}.md"
+        with open(path, "w") as f:
+            f.write(report)
+        print(f"\n📄 Report saved to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
-import requests
+import os
+import sys
 import time
 import re
 import json
 from datetime import datetime
 from flask import Flask, request, Response, render_template_string
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import hexclient
+
 # ================= CONFIG =================
 
 OLLAMA_URL = "http://localhost:11434"
@@ -47,17 +51,17 @@ def save_memory(mem):
 # ================= HEXSTRIKE =================
 
 def discover_tools():
-    r = requests.get(f"{Hexstrike}/health", timeout=TIMEOUT)
+    r = hexclient.get(f"{Hexstrike}/health", read_timeout=TIMEOUT)
     r.raise_for_status()
     tools_status = r.json().get("tools_status", {})
     return sorted(t for t, ok in tools_status.items() if ok)
 
 
 def exec_hex(cmd):
-    r = requests.post(
+    r = hexclient.post(
         f"{Hexstrike}/api/command",
         json={"command": cmd},
-        timeout=300
+        read_timeout=300
     )
     if r.status_code == 200:
         return r.json().get("output", "")
@@ -67,14 +71,15 @@ def exec_hex(cmd):
 # ================= OLLAMA =================
 
 def ollama(model, system, prompt):
-    r = requests.post(
+    r = hexclient.post(
         f"{OLLAMA_URL}/api/generate",
         json={
             "model": model,
             "system": system,
             "prompt": prompt,
             "stream": False
-        }
+        },
+        read_timeout=None
     )
     r.raise_for_status()
     return r.json()["response"].strip()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import json
+import xml.etree.ElementTree as ET
+
+# Turns raw tool output into a short list of findings, without an LLM call.
+#
+#   summary, facts = condense("nmap", output)
+#
+# summary goes into the ANALYZE prompt instead of the raw output (a full nmap or nikto run
+# can be thousands of lines), facts are one line each and go into memory["facts"].
+# Machine formats are preferred (nmap XML, nuclei / httpx JSON lines, whatweb JSON) and
+# machine_command() adds the flags for them to a command. Text output is parsed too.
+#
+# Tools without a condenser get the start and end of their output (MAX_RAW characters).
+#
+#   python3 condensers.py nmap scan.xml      try one on a saved output
+
+# ===================== DEFAULTS =====================
+
+MAX_ITEMS = 40      # findings per tool output
+MAX_RAW = 4000      # characters kept of output nothing could be parsed from
+
+# tool -> (flag added for machine readable output, flags that already choose an output format)
+MACHINE_FLAGS = {
+    "nmap": ("-oX -", ("-oX", "-oA", "-oN", "-oG")),
+    "nuclei": ("-jsonl", ("-json", "-jsonl", "-j")),
+    "httpx": ("-json", ("-json", "-j")),
+    "whatweb": ("-q --log-json=-", ("--log-json", "--log-brief", "--log-verbose", "--log-xml",
+                                    "--log-magictree", "--log-object", "--log-mongo", "--log-sql",
+                                    "--log-elastic", "-q", "--quiet")),
+}
+
+SEVERITY = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4, "unknown": 5}
+
+# ===================== HELPERS =====================
+
+def machine_command(cmd):
+    # The command with the flag for machine readable output, if the tool has one
+    words = cmd.split()
+    if not words or words[0] not in MACHINE_FLAGS:
+        return cmd
+    flag, existing = MACHINE_FLAGS[words[0]]
+    if any(w.split("=")[0] in existing for w in words[1:]):
+        return cmd
+    return f"{cmd} {flag}"
+
+
+def json_lines(output):
+    # Every line that is a JSON object, plus a top level JSON array if the output is one
+    items = []
+    text = output.strip()
+    if text.startswith("["):
+        try:
+            data = json.loads(text)
+            return [d for d in data if isinstance(d, dict)]
+        except ValueError:
+            pass
+    for line in output.splitlines():
+        line = line.strip().rstrip(",")  # whatweb's JSON array has one object per line
+        if line.startswith("{"):
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                pass
+    return items
+
+
+def raw(output):
+    if len(output) <= MAX_RAW:
+        return output
+    half = MAX_RAW // 2
+    return f"{output[:half]}\n[... {len(output) - MAX_RAW} characters left out ...]\n{output[-half:]}"
+
+
+def summarize(title, findings):
+    findings = list(dict.fromkeys(findings))  # duplicates out, order kept
+    lines = findings[:MAX_ITEMS]
+    if len(findings) > MAX_ITEMS:
+        lines.append(f"... {len(findings) - MAX_ITEMS} more")
+    return f"{title}:\n" + "\n".join(f"- {l}" for l in lines), findings[:MAX_ITEMS]
+
+# ===================== NMAP =====================
+
+NMAP_PORT = re.compile(r"^(\d+)/(tcp|udp)\s+open\S*\s+(\S+)\s*(.*)$")
+NMAP_HOST = re.compile(r"^Nmap scan report for (.+)$")
+
+
+def nmap(output):
+    start = output.find("<nmaprun")
+    if start >= 0:
+        try:
+            return nmap_xml(output[start:])
+        except ET.ParseError:
+            pass
+    findings = []
+    host = ""
+    for line in output.splitlines():
+        line = line.strip()
+        m = NMAP_HOST.match(line)
+        if m:
+            host = m.group(1)
+            continue
+        m = NMAP_PORT.match(line)
+        if m:
+            port, proto, service, version = m.groups()
+            findings.append(f"{host} {port}/{proto} open {service} {version}".strip())
+        elif line.startswith(("OS details:", "Running:", "Service Info:")):
+            findings.append(f"{host} {line}".strip())
+    return findings
+
+
+def nmap_xml(text):
+    root = ET.fromstring(text[:text.rfind("</nmaprun>") + len("</nmaprun>")])
+    findings = []
+    for host in root.iter("host"):
+        addr = next((a.get("addr") for a in host.iter("address") if a.get("addrtype") != "mac"), "")
+        name = next((h.get("name") for h in host.iter("hostname")), "")
+        label = f"{name} ({addr})" if name else addr
+        for port in host.iter("port"):
+            state = port.find("state")
+            if state is None or state.get("state") != "open":
+                continue
+            service = port.find("service")
+            desc = ""
+            if service is not None:
+                desc = " ".join(v for v in (service.get("name"), service.get("product"),
+                                            service.get("version"), service.get("extrainfo")) if v)
+            findings.append(f"{label} {port.get('portid')}/{port.get('protocol')} open {desc}".strip())
+            for script in port.iter("script"):
+                first = (script.get("output") or "").strip().splitlines()
+                if first:
+                    findings.append(f"{label} {port.get('portid')} {script.get('id')}: {first[0].strip()[:150]}")
+        for osmatch in host.iter("osmatch"):
+            findings.append(f"{label} OS: {osmatch.get('name')} ({osmatch.get('accuracy')}%)")
+            break
+    return findings
+
+# ===================== NUCLEI =====================
+
+NUCLEI_TEXT = re.compile(r"^\[([^\]]+)\]\s+\[([^\]]+)\]\s+\[([^\]]+)\]\s+(\S+)(.*)$")
+
+
+def nuclei(output):
+    hits = []
+    for d in json_lines(output):
+        info = d.get("info", {})
+        severity = str(info.get("severity", "unknown")).lower()
+        where = d.get("matched-at") or d.get("host") or ""
+        extra = d.get("extracted-results") or []
+        text = f"[{severity}] {d.get('template-id', '?')} {info.get('name', '')} at {where}"
+        if extra:
+            text += f" ({', '.join(map(str, extra[:3]))})"
+        hits.append((SEVERITY.get(severity, 5), text))
+    if not hits:
+        for line in output.splitlines():
+            m = NUCLEI_TEXT.match(re.sub(r"\x1b\[[0-9;]*m", "", line.strip()))
+            if m:
+                template, _, severity, where, extra = m.groups()
+                severity = severity.lower()
+                hits.append((SEVERITY.get(severity, 5), f"[{severity}] {template} at {where}{extra}".strip()))
+    # Worst first
+    return [text for _, text in sorted(hits, key=lambda h: h[0])]
+
+# ===================== WHATWEB =====================
+
+WHATWEB_LINE = re.compile(r"^(\S+://\S+)\s+\[([^\]]+)\]\s*(.*)$")
+WHATWEB_PLUGIN = re.compile(r"([^\[,]+)((?:\[[^\]]*\])*)(?:,\s*|$)")
+WHATWEB_SKIP = {"Country", "IP"}
+
+
+def whatweb(output):
+    findings = []
+    for d in json_lines(output):
+        plugins = []
+        for name, value in (d.get("plugins") or {}).items():
+            if name in WHATWEB_SKIP:
+                continue
+            detail = (value.get("version") or value.get("string") or []) if isinstance(value, dict) else []
+            plugins.append(f"{name}[{', '.join(map(str, detail))}]" if detail else name)
+        findings.append(f"{d.get('target', '')} [{d.get('http_status', '')}] {', '.join(plugins)}")
+    if findings:
+        return findings
+    for line in output.splitlines():
+        m = WHATWEB_LINE.match(re.sub(r"\x1b\[[0-9;]*m", "", line.strip()))
+        if not m:
+            continue
+        url, status, rest = m.groups()
+        plugins = [f"{n.strip()}{v}" for n, v in WHATWEB_PLUGIN.findall(rest)
+                   if n.strip() and n.strip() not in WHATWEB_SKIP]
+        findings.append(f"{url} [{status}] {', '.join(plugins)}")
+    return findings
+
+# ===================== HTTPX =====================
+
+HTTPX_LINE = re.compile(r"^(\S+://\S+)((?:\s+\[[^\]]*\])*)\s*$")
+
+
+def httpx(output):
+    findings = []
+    for d in json_lines(output):
+        parts = [d.get("url", ""), f"[{d.get('status_code', d.get('status-code', ''))}]"]
+        if d.get("title"):
+            parts.append(f"title: {d['title']}")
+        if d.get("webserver"):
+            parts.append(f"server: {d['webserver']}")
+        tech = d.get("tech") or d.get("technologies")
+        if tech:
+            parts.append(f"tech: {', '.join(tech)}")
+        findings.append(" ".join(parts))
+    if findings:
+        return findings
+    for line in output.splitlines():
+        m = HTTPX_LINE.match(re.sub(r"\x1b\[[0-9;]*m", "", line.strip()))
+        if m:
+            findings.append(f"{m.group(1)} {m.group(2).strip()}".strip())
+    return findings
+
+# ===================== GOBUSTER =====================
+
+GOBUSTER_LINE = re.compile(r"^(\S+)\s+\(Status:\s*(\d+)\)(?:\s*\[Size:\s*(\d+)\])?(?:\s*\[-->\s*([^\]]+)\])?")
+GOBUSTER_DNS = re.compile(r"^Found:\s+(\S+)(.*)$")
+
+
+def gobuster(output):
+    findings = []
+    for line in output.splitlines():
+        line = re.sub(r"\x1b\[[0-9;]*[mK]", "", line).strip().lstrip("\r")
+        m = GOBUSTER_LINE.match(line)
+        if m:
+            path, status, size, redirect = m.groups()
+            text = f"{path} {status}"
+            if size:
+                text += f" size {size}"
+            if redirect:
+                text += f" -> {redirect.strip()}"
+            findings.append(text)
+            continue
+        m = GOBUSTER_DNS.match(line)
+        if m:
+            findings.append(f"{m.group(1)}{m.group(2)}".strip())
+    # Interesting status codes first (200, then redirects and auth, then the rest)
+    order = {"2": 0, "4": 1, "3": 2}
+    return sorted(findings, key=lambda f: order.get((f.split() + ["", ""])[1][:1], 3))
+
+# ===================== NIKTO =====================
+
+NIKTO_SKIP = ("Target IP", "Target Hostname", "Target Port", "Start Time", "End Time",
+              "host(s) tested", "requests:", "Nikto v", "SSL Info", "Ciphers", "Issuer")
+
+
+def nikto(output):
+    findings = []
+    for line in output.splitlines():
+        line = line.strip()
+        if not line.startswith("+ "):
+            continue
+        text = line[2:].strip()
+        if not text or any(s in text for s in NIKTO_SKIP):
+            continue
+        findings.append(text[:200])
+    return findings
+
+# ===================== CONDENSE =====================
+
+CONDENSERS = {
+    "nmap": ("Open ports and services", nmap),
+    "nuclei": ("Nuclei findings (worst first)", nuclei),
+    "whatweb": ("Technologies", whatweb),
+    "httpx": ("Live HTTP services", httpx),
+    "gobuster": ("Paths found", gobuster),
+    "nikto": ("Nikto findings", nikto),
+}
+
+
+def condense(tool, output):
+    # (summary for the prompt, facts for memory). Facts are empty when nothing was parsed.
+    if tool not in CONDENSERS:
+        return raw(output), []
+    title, parse = CONDENSERS[tool]
+    try:
+        findings = parse(output)
+    except Exception:
+        findings = []
+    if not findings:
+        if output.strip():
+            return raw(output), []
+        return f"{title}: nothing found", []
+    summary, kept = summarize(title, findings)
+    return summary, [f"{tool}: {f}" for f in kept]
+
+# ===================== MAIN =====================
+
+def main():
+    if len(sys.argv) != 3:
+        print("usage: python3 condensers.py <tool> <saved output file>")
+        return 1
+    with open(sys.argv[2], "r", errors="replace") as f:
+        summary, facts = condense(sys.argv[1], f.read())
+    print(summary)
+    print(f"\n{len(facts)} facts")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import json
+
+# Fits facts, notes and evidence into a token budget, so the PLAN and report prompts stop
+# growing with the engagement.
+#
+#   text, dropped = assemble([
+#       ("Known Facts", [(fact_priority(f), f) for f in memory["facts"]]),
+#       ("Notes", [(1, n) for n in memory["notes"]]),
+#   ], budget=2000)
+#
+# Items are kept by priority (0 = most important) and then recency (the later in its list,
+# the newer), until the budget is used up. What is kept is written in its original order, so
+# the prompt still starts the same way from one cycle to the next (Ollama's prompt cache).
+# Every section that lost items ends with a line saying how many, dropped has the counts.
+#
+# Tokens are estimated (CHARS_PER_TOKEN), which is close enough for llama style tokenizers
+# on English and tool output and costs nothing next to an LLM call.
+
+# ===================== DEFAULTS =====================
+
+CHARS_PER_TOKEN = 4
+EXCERPT_CHARS = 500   # of raw evidence output, when it has no condensed findings
+
+# ===================== TOKENS =====================
+
+def estimate(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+# ===================== PRIORITIES =====================
+
+def fact_priority(fact):
+    # Vulnerabilities first, then services and versions, then everything else
+    text = fact.lower()
+    if any(s in text for s in ("[critical]", "[high]", "vulnerab", "cve-")):
+        return 0
+    if any(s in text for s in ("[medium]", " open ", "version")):
+        return 1
+    return 2
+
+
+def evidence_item(evidence):
+    # (priority, one line of JSON) for a memory["evidence"] record. Condensed findings stand in
+    # for the raw excerpt, otherwise the excerpt is shortened.
+    record = {k: v for k, v in evidence.items() if k not in ("type", "excerpt", "findings")}
+    if evidence.get("findings"):
+        record["findings"] = evidence["findings"]
+        priority = min(fact_priority(f) for f in evidence["findings"])
+    else:
+        record["excerpt"] = evidence.get("excerpt", "")[:EXCERPT_CHARS]
+        priority = 2
+    return priority, json.dumps(record)
+
+# ===================== ASSEMBLE =====================
+
+def assemble(sections, budget):
+    # sections: [(title, [(priority, text), ...]), ...] in prompt order, each list oldest first.
+    # Returns (prompt text, {title: items dropped}).
+    used = sum(estimate(f"{title}:\n") for title, _ in sections)
+    ranked = sorted(
+        ((priority, -i, s, i) for s, (_, items) in enumerate(sections) for i, (priority, _) in enumerate(items)),
+    )
+    keep = set()
+    for _, _, s, i in ranked:
+        cost = estimate(sections[s][1][i][1])
+        if used + cost > budget:
+            continue  # a smaller item further down may still fit
+        used += cost
+        keep.add((s, i))
+
+    blocks = []
+    dropped = {}
+    for s, (title, items) in enumerate(sections):
+        lines = [text for i, (_, text) in enumerate(items) if (s, i) in keep]
+        if len(lines) < len(items):
+            dropped[title] = len(items) - len(lines)
+            lines.append(f"({dropped[title]} less important or older entries left out)")
+        blocks.append(f"{title}:\n" + "\n".join(lines))
+    return "\n\n".join(blocks), dropped
+
+
+def describe(dropped, budget):
+    # One line for the console, empty when everything fit
+    if not dropped:
+        return ""
+    parts = ", ".join(f"{n} {title.lower()}" for title, n in dropped.items())
+    return f"✂️ Context over {budget} tokens, left out: {parts}"
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP client for Ollama and Hexstrike.
+#
+# One keep-alive requests.Session per endpoint (scheme://host:port), so the agent reuses
+# the same TCP connection for every PLAN / EXECUTE / ANALYZE call and Hexstrike command
+# instead of opening a new one each time. Sessions are thread safe enough for our use
+# (one pool per endpoint, POOL_MAXSIZE connections), so the TUI thread can share them.
+#
+#   import hexclient
+#   r = hexclient.get(f"{OLLAMA_URL}/api/tags", read_timeout=10)
+#   r = hexclient.post(f"{HEXSTRIKE_URL}/api/command", json={...}, read_timeout=300)
+#   text, final = hexclient.ollama_stream(OLLAMA_URL, {"model": ..., "prompt": ...}, on_chunk=print)
+
+# ===================== DEFAULTS =====================
+
+CONNECT_TIMEOUT = 5        # seconds to open the connection
+POOL_CONNECTIONS = 4       # endpoints kept per session (one per session is enough)
+POOL_MAXSIZE = 8           # connections kept open per endpoint (parallel calls)
+RETRIES = 3
+BACKOFF = 0.5              # 0.5s, 1s, 2s between retries
+RETRY_STATUS = (502, 503, 504)
+
+_SESSIONS = {}
+_LOCK = threading.Lock()
+
+# ===================== CONFIG =====================
+
+def configure(connect_timeout=None, pool_maxsize=None, retries=None, backoff=None):
+    # Change the defaults, only affects sessions created afterwards
+    global CONNECT_TIMEOUT, POOL_MAXSIZE, RETRIES, BACKOFF
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+    if retries is not None:
+        RETRIES = retries
+    if backoff is not None:
+        BACKOFF = backoff
+
+
+def _endpoint(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+# ===================== SESSIONS =====================
+
+def session(url):
+    endpoint = _endpoint(url)
+    with _LOCK:
+        s = _SESSIONS.get(endpoint)
+        if s is None:
+            # Connection errors are retried for every request (nothing was sent yet).
+            # 502/503/504 and read errors only for GETs, a POSTed Hexstrike command
+            # is never run twice.
+            retry = Retry(
+                total=RETRIES,
+                connect=RETRIES,
+                read=RETRIES,
+                status=RETRIES,
+                backoff_factor=BACKOFF,
+                status_forcelist=RETRY_STATUS,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONNECTIONS,
+                pool_maxsize=POOL_MAXSIZE,
+                max_retries=retry,
+            )
+            s = requests.Session()
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _SESSIONS[endpoint] = s
+        return s
+
+
+def close():
+    with _LOCK:
+        for s in _SESSIONS.values():
+            s.close()
+        _SESSIONS.clear()
+
+# ===================== REQUESTS =====================
+
+def get(url, read_timeout=10, **kwargs):
+    return session(url).get(url, timeout=(CONNECT_TIMEOUT, read_timeout), **kwargs)
+
+
+def post(url, json=None, read_timeout=300, **kwargs):
+    return session(url).post(url, json=json, timeout=(CONNECT_TIMEOUT, read_timeout), **kwargs)
+
+
+def ollama_stream(ollama_url, payload, on_chunk=None, cutoff=None, read_timeout=300):
+    # Streams /api/generate, on_chunk(text) gets every piece as it arrives. When cutoff(text so
+    # far) returns True the connection is closed, which stops Ollama generating the rest.
+    # Returns (text, the last JSON message from Ollama, with the timings when it finished).
+    payload = dict(payload, stream=True)
+    text = ""
+    data = {}
+    with post(f"{ollama_url}/api/generate", json=payload, read_timeout=read_timeout, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            chunk = data.get("response", "")
+            text += chunk
+            if on_chunk and chunk:
+                on_chunk(chunk)
+            if data.get("done") or (cutoff and cutoff(text)):
+                break
+    return text, data
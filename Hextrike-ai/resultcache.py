@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+# Disk cache of Hexstrike command results, so the same scan (same tool, flags and target)
+# isn't run again within its TTL, across cycles and across runs.
+#
+#   cache/index.json      key -> command, tool, when it was run, size
+#   cache/<key>.gz        the gzip compressed output
+#
+# Commands are normalized before hashing (whitespace, URL host case, trailing slash), so
+# "nmap -sV  http://Target/" and "nmap -sV http://target" are the same scan. Quoting is
+# kept, 'a b' is one argument and not two. Only successful, non-empty results are cached.
+#
+#   python3 resultcache.py list     what is cached and how old it is
+#   python3 resultcache.py prune    drop expired entries
+#   python3 resultcache.py clear    drop everything
+
+# ===================== DEFAULTS =====================
+
+CACHE_DIR = "cache"
+DEFAULT_TTL = 3600          # seconds
+TTLS = {                    # per tool, 0 = never cached
+    "nmap": 6 * 3600,
+    "whatweb": 24 * 3600,
+    "nuclei": 24 * 3600,
+    "nikto": 24 * 3600,
+    "gobuster": 12 * 3600,
+    "subfinder": 24 * 3600,
+    "httpx": 3600,
+    "sqlmap": 0,
+    "hydra": 0,
+}
+
+# ===================== KEYS =====================
+
+def normalize(cmd):
+    try:
+        words = shlex.split(cmd)
+    except ValueError:
+        words = cmd.split()
+    out = []
+    for w in words:
+        if "://" in w:
+            scheme, rest = w.split("://", 1)
+            host, _, path = rest.partition("/")
+            w = f"{scheme.lower()}://{host.lower()}/{path}".rstrip("/")
+        out.append(w)
+    if out:
+        out[0] = out[0].lower()
+    return shlex.join(out)
+
+
+def cache_key(cmd):
+    return hashlib.sha256(normalize(cmd).encode()).hexdigest()[:32]
+
+
+def ttl(tool):
+    return TTLS.get(tool, DEFAULT_TTL)
+
+# ===================== CACHE =====================
+
+class ResultCache:
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+        self.index_path = os.path.join(path, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".gz")
+
+    def get(self, cmd):
+        # (output, unix time it was run) if cached and not expired, else None
+        key = cache_key(cmd)
+        with self.lock:
+            entry = self.index.get(key)
+        if not entry or time.time() - entry["created"] > ttl(entry["tool"]):
+            return None
+        try:
+            with gzip.open(self._file(key), "rt", encoding="utf-8") as f:
+                return f.read(), entry["created"]
+        except OSError:
+            return None
+
+    def put(self, cmd, output, ok=True):
+        # ok: the command succeeded (not failed or timed out in Hexstrike)
+        tool = normalize(cmd).split(" ")[0]
+        if not ttl(tool) or not ok or not output.strip():
+            return  # never cached, a failed call or nothing to reuse
+        key = cache_key(cmd)
+        # A temporary file of its own, the same command can be finishing in another thread
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=key, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8", compresslevel=6) as f:
+                f.write(output)
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        with self.lock:
+            self.index[key] = {
+                "command": normalize(cmd),
+                "tool": tool,
+                "created": time.time(),
+                "size": len(output),
+            }
+            self._save()
+
+    def prune(self, everything=False):
+        now = time.time()
+        with self.lock:
+            expired = [k for k, e in self.index.items()
+                       if everything or now - e["created"] > ttl(e["tool"])]
+            for key in expired:
+                del self.index[key]
+                try:
+                    os.remove(self._file(key))
+                except OSError:
+                    pass
+            self._save()
+        return len(expired)
+
+    def _save(self):
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix="index", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+# ===================== MAIN =====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Hexstrike result cache")
+    parser.add_argument("command", choices=["list", "prune", "clear"])
+    parser.add_argument("--dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    cache = ResultCache(args.dir)
+    if args.command == "list":
+        now = time.time()
+        for e in sorted(cache.index.values(), key=lambda e: e["created"]):
+            age = (now - e["created"]) / 60
+            state = "expired" if now - e["created"] > ttl(e["tool"]) else "valid"
+            when = datetime.fromtimestamp(e["created"]).strftime("%Y-%m-%d %H:%M")
+            print(f"{when}  {age:>7.0f}m  {state:<7}  {e['size']:>8}  {e['command']}")
+    else:
+        n = cache.prune(everything=args.command == "clear")
+        print(f"Removed {n} entries")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+import agent
+
+# python3 -m pytest test_agent.py  (needs requests, like agent.py)
+
+
+def test_execute_multi_line_reply_gives_several_commands():
+    reply = "!hex nmap -sV 10.0.0.1\n!hex whatweb http://10.0.0.1\n!hex nuclei -u http://10.0.0.1\n"
+    assert not agent.execute_done(reply)
+    commands = agent.parse_commands(agent.execute_trim(reply), ["nmap", "whatweb", "nuclei"])
+    assert commands == ["nmap -sV 10.0.0.1", "whatweb http://10.0.0.1", "nuclei -u http://10.0.0.1"]
+
+
+def test_execute_done_after_the_commands():
+    assert agent.execute_done("!hex nmap x\n!hex whatweb x\nThese scan the target\n")
+    assert agent.execute_done("\n!hex nmap x\nNO TOOL")
+    assert agent.execute_done("".join(f"!hex nmap {i}\n" for i in range(agent.MAX_COMMANDS)))
+    assert not agent.execute_done("\n\n!hex nmap x\n")
+
+
+def test_execute_trim_drops_the_explanation():
+    reply = "\n!hex nmap x\n!hex whatweb x\nThis finds the open ports."
+    assert agent.execute_trim(reply).strip() == "!hex nmap x\n!hex whatweb x"
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
+import os
+import sys
 import curses
-import requests
 import json
 import time
 import threading
 import re
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import hexclient
+
 # ===================== DEFAULTS =====================
 
 DEFAULT_OLLAMA_URL = "http://localhost:11434"
@@ -40,19 +44,48 @@ LAST_DRAW = {
 
 # ===================== LLM =====================
 
-def ollama_generate(prompt, system=""):
-    r = requests.post(
-        f"{STATE['ollama_url']}/api/generate",
-        json={
-            "model": STATE["model"],
-            "system": system,
-            "prompt": prompt,
-            "stream": False
-        },
-        timeout=300
+# EXECUTE needs one short line, so it is capped and cut off as soon as the line is there
+EXECUTE_OPTIONS = {"num_predict": 64}
+
+
+def is_command(line):
+    return bool(HEX_PATTERN.match(line.strip())) or line.strip().upper() == "NO TOOL"
+
+
+def execute_done(text):
+    # A complete !hex line, or NO TOOL (blank lines before it don't count)
+    lines = text.split("\n")
+    if lines[-1].strip().upper() == "NO TOOL":
+        return True
+    return any(is_command(l) for l in lines[:-1])
+
+
+def execute_trim(text):
+    # Drops whatever the model added after the command
+    lines = text.split("\n")
+    last = max((i for i, l in enumerate(lines) if is_command(l)), default=None)
+    return text if last is None else "\n".join(lines[:last + 1])
+
+
+def ollama_generate(prompt, system="", execute=False):
+    # Streamed into the RESPONSE panel as it is generated
+    STATE["llm_response"] = ""
+
+    def show(chunk):
+        STATE["llm_response"] += chunk
+
+    payload = {
+        "model": STATE["model"],
+        "system": system,
+        "prompt": prompt,
+    }
+    if execute:
+        payload["options"] = EXECUTE_OPTIONS
+    text, _ = hexclient.ollama_stream(
+        STATE["ollama_url"], payload, on_chunk=show,
+        cutoff=execute_done if execute else None
     )
-    r.raise_for_status()
-    return r.json()["response"].strip()
+    return (execute_trim(text) if execute else text).strip()
 
 
 def extract_confidence(text):
@@ -67,17 +100,17 @@ def extract_confidence(text):
 # ===================== HEXSTRIKE =====================
 
 def discover_tools():
-    r = requests.get(f"{STATE['hex_url']}/health", timeout=TIMEOUT)
+    r = hexclient.get(f"{STATE['hex_url']}/health", read_timeout=TIMEOUT)
     r.raise_for_status()
     tools_status = r.json().get("tools_status", {})
     return sorted(t for t, ok in tools_status.items() if ok)
 
 
 def execute_hexstrike(cmd):
-    r = requests.post(
+    r = hexclient.post(
         f"{STATE['hex_url']}/api/command",
         json={"command": cmd},
-        timeout=300
+        read_timeout=300
     )
     if r.status_code == 200:
         return r.json().get("output", "")
@@ -142,7 +175,9 @@ OR
 NO TOOL
 """
         STATE["llm_prompt"] = exec_prompt
-        execute = ollama_generate(exec_prompt, system_prompt()).strip()
+        execute = ollama_generate(exec_prompt, system_prompt(), execute=True).strip()
+        # Only the !hex line, if the model kept going after it
+        execute = next((l.strip() for l in execute.splitlines() if HEX_PATTERN.match(l.strip())), execute)
         STATE["llm_response"] = execute
 
         tool_output = "NO TOOL"
@@ -288,7 +323,7 @@ def setup():
     STATE["tools"] = discover_tools()
     print(f"Found {len(STATE['tools'])} tools.")
 
-    models = requests.get(f"{STATE['ollama_url']}/api/tags", timeout=TIMEOUT).json()["models"]
+    models = hexclient.get(f"{STATE['ollama_url']}/api/tags", read_timeout=TIMEOUT).json()["models"]
 
     print("\nAvailable Ollama models:")
     for i, m in enumerate(models, 1):
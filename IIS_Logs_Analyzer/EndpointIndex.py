@@ -0,0 +1,194 @@
+import os
+import sys
+import hashlib
+from datetime import datetime, timedelta
+# This keeps an index of every endpoint with the first time it was seen, the last time
+# it was seen and how many hits it got, so we can answer "what hasn't been touched in 90 days".
+# The index and how far we got into each log file are saved, so each run only reads
+# the new log lines instead of all of the history. A log whose first bytes changed (Step1
+# stripped its header, or a new file replaced it) is read again, skipping the lines up to the
+# last time already counted from it.
+#
+# Update the index:            python3 EndpointIndex.py
+# Endpoints idle for 90 days:  python3 EndpointIndex.py idle 90
+# Specify the directory containing your files
+directory = 'RAWLogs'
+index_file = 'EndpointIndex.tsv'
+offsets_file = 'EndpointIndex.offsets'
+
+# Within the logs the endpoint is in Position 7 (cut -f 7), unless a #Fields: header says otherwise
+DEFAULT_URI_FIELD = 6
+FINGERPRINT_BYTES = 4096  # Start of each log file hashed to notice it was rewritten
+
+
+def normalize(uri):
+    # Same as Step3.sh (cut -d'/' -f1-2), only keep the first level (i.e. /Level1)
+    # IIS paths are case insensitive so /App and /app are the same endpoint
+    return '/'.join(uri.split('/', 2)[:2]).lower()
+
+
+def load_index():
+    # site, endpoint -> [first seen, last seen, hits]
+    index = {}
+    if os.path.isfile(index_file):
+        with open(index_file, 'r') as f:
+            for line in f:
+                site, endpoint, first, last, hits = line.rstrip('\n').split('\t')
+                index[(site, endpoint)] = [first, last, int(hits)]
+    return index
+
+
+def save_index(index):
+    # Written oldest last-seen first, so the idle query can stop reading early
+    tmp = index_file + '.tmp'
+    with open(tmp, 'w') as f:
+        for (site, endpoint), (first, last, hits) in sorted(index.items(), key=lambda kv: kv[1][1]):
+            f.write(f'{site}\t{endpoint}\t{first}\t{last}\t{hits}\n')
+    os.replace(tmp, index_file)
+
+
+def load_offsets():
+    # path -> [bytes processed, fingerprint of the start of the file, last time read]
+    offsets = {}
+    if os.path.isfile(offsets_file):
+        with open(offsets_file, 'r') as f:
+            for line in f:
+                path, done, mark, last = (line.rstrip('\n').split('\t') + ['', ''])[:4]
+                offsets[path] = [int(done), mark, last]
+    return offsets
+
+
+def save_offsets(offsets):
+    tmp = offsets_file + '.tmp'
+    with open(tmp, 'w') as f:
+        for path, (done, mark, last) in sorted(offsets.items()):
+            f.write(f'{path}\t{done}\t{mark}\t{last}\n')
+    os.replace(tmp, offsets_file)
+
+
+def fingerprint(file_path, length):
+    # Hash of the first length bytes, compared on the next run to notice a rewritten file
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def parse_fields(raw, uri_field, site_field):
+    # The #Fields: line tells us where the columns are
+    names = raw.decode('utf-8', 'replace').split()[1:]
+    if 'cs-uri-stem' in names:
+        uri_field = names.index('cs-uri-stem')
+    site_field = names.index('s-sitename') if 's-sitename' in names else None
+    return uri_field, site_field
+
+
+def fields_header(f, start):
+    # The last #Fields: line before start (IIS writes a new header after every restart)
+    uri_field, site_field = DEFAULT_URI_FIELD, None
+    f.seek(0)
+    read = 0
+    for raw in f:
+        read += len(raw)
+        if read > start:
+            break
+        if raw.startswith(b'#Fields:'):
+            uri_field, site_field = parse_fields(raw, uri_field, site_field)
+    f.seek(start)
+    return uri_field, site_field
+
+
+def process_file(file_path, site, start, index, skip_until=''):
+    # Returns (bytes processed up to, latest time read). Lines at or before skip_until are skipped.
+    processed = 0
+    latest = skip_until
+    seen = {}  # endpoint entries for this file, merged into the index at the end
+    with open(file_path, 'rb') as f:
+        uri_field, site_field = fields_header(f, start)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break  # Line still being written, pick it up next run
+            processed += len(raw)
+            if raw.startswith(b'#'):
+                if raw.startswith(b'#Fields:'):
+                    uri_field, site_field = parse_fields(raw, uri_field, site_field)
+                continue
+            fields = raw.decode('utf-8', 'replace').split(' ')
+            if len(fields) <= uri_field or (site_field is not None and len(fields) <= site_field):
+                continue
+            when = fields[0] + ' ' + fields[1]
+            if when <= skip_until:
+                continue  # Read before, the file was rewritten
+            latest = max(latest, when)
+            key = (fields[site_field] if site_field is not None else site, normalize(fields[uri_field]))
+            entry = seen.get(key)
+            if entry is None:
+                seen[key] = [when, when, 1]
+            else:
+                if when < entry[0]:
+                    entry[0] = when
+                if when > entry[1]:
+                    entry[1] = when
+                entry[2] += 1
+
+    for key, (first, last, hits) in seen.items():
+        entry = index.get(key)
+        if entry is None:
+            index[key] = [first, last, hits]
+        else:
+            entry[0] = min(entry[0], first)
+            entry[1] = max(entry[1], last)
+            entry[2] += hits
+    return start + processed, latest
+
+
+def update():
+    index = load_index()
+    offsets = load_offsets()
+
+    # IIS keeps one folder per site (W3SVC1, W3SVC2...), so the folder name is the site
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        site = os.path.relpath(root, directory)
+        site = '-' if site == '.' else site
+        for filename in sorted(files):
+            file_path = os.path.join(root, filename)
+            size = os.path.getsize(file_path)
+            done, mark, latest = offsets.get(file_path, [0, '', ''])
+            skip_until = ''
+            if done and (size < done or (mark and fingerprint(file_path, min(done, FINGERPRINT_BYTES)) != mark)):
+                # File was truncated, rewritten or replaced, start over past what was read
+                done, skip_until = 0, latest
+            if size == done:
+                continue
+            done, read_until = process_file(file_path, site, done, index, skip_until)
+            # Fingerprint of what was read, so it can be compared while the file grows
+            offsets[file_path] = [done, fingerprint(file_path, min(done, FINGERPRINT_BYTES)),
+                                  max(latest, read_until)]
+            print(f'Processed {file_path}')
+
+    save_index(index)
+    save_offsets(offsets)
+    print(f'{len(index)} endpoints indexed')
+
+
+def idle(days):
+    # IIS logs are in UTC
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    found = 0
+    if not os.path.isfile(index_file):
+        print(f'No {index_file} yet, run python3 EndpointIndex.py first')
+        return
+    with open(index_file, 'r') as f:
+        for line in f:
+            site, endpoint, first, last, hits = line.rstrip('\n').split('\t')
+            if last >= cutoff:
+                break  # Sorted by last seen, everything after this is newer
+            print(f'{site}\t{endpoint}\tlast seen {last}\tfirst seen {first}\t{hits} hits')
+            found += 1
+    print(f'{found} endpoints idle for more than {days} days')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == 'idle':
+        idle(int(sys.argv[2]))
+    else:
+        update()
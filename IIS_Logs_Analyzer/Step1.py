@@ -1,22 +1,59 @@
 import os
+import sys
+import shutil
 #This deletes the first # lines of all files.. This is not log data
+# The rest of each file is streamed into a new file through a small buffer and swapped in,
+# so this needs the same (small) amount of memory for a 4 GB log as for a tiny one.
+#
+# python3 Step1.py --keep  leaves the files as they are and only saves where the log data
+# starts in RAWLogs/.header_offsets, the next steps then seek straight past the header.
+# Each offset is saved with the file's size and modification time, the next steps ignore it
+# if the file has changed since. A normal run removes the offsets of the files it strips.
 # Specify the directory containing your files
 directory = './RAWLogs'
+offsets_file = os.path.join(directory, '.header_offsets')
+BUFFER = 1024 * 1024
+keep = '--keep' in sys.argv[1:]
+
+# file name -> [offset, size, mtime] (older files only have the offset)
+offsets = {}
+if os.path.isfile(offsets_file):
+    with open(offsets_file, 'r') as f:
+        for line in f:
+            name, *entry = line.rstrip('\n').split('\t')
+            offsets[name] = entry
 
 # Loop through all files in the directory
 for filename in os.listdir(directory):
     file_path = os.path.join(directory, filename)
 
-    # Check if it's a file (not a subdirectory)
-    if os.path.isfile(file_path):
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-
-        # Remove the first 3 lines
-        lines = lines[4:]
+    # Check if it's a file (not a subdirectory, or our own .header_offsets)
+    if os.path.isfile(file_path) and not filename.startswith('.'):
+        if keep:
+            with open(file_path, 'rb') as file:
+                # Skip the first 4 lines, and remember where the log data starts
+                for _ in range(4):
+                    if not file.readline():
+                        break
+                stat = os.fstat(file.fileno())
+                offsets[filename] = [file.tell(), stat.st_size, int(stat.st_mtime)]
+        else:
+            with open(file_path, 'r', errors='surrogateescape') as file, \
+                    open(file_path + '.tmp', 'w', errors='surrogateescape') as out:
+                # Remove the first 4 lines (#Software, #Version, #Date, #Fields)
+                for _ in range(4):
+                    if not file.readline():
+                        break
 
-        # Write the remaining lines back to the file
-        with open(file_path, 'w') as file:
-            file.writelines(lines)
+                # Write the remaining lines to the new file, BUFFER characters at a time
+                shutil.copyfileobj(file, out, BUFFER)
+            os.replace(file_path + '.tmp', file_path)
+            # The header is gone, an offset saved by an earlier --keep run would skip log data
+            offsets.pop(filename, None)
 
         print(f'Processed {filename}')
+
+if keep or os.path.isfile(offsets_file):
+    with open(offsets_file, 'w') as f:
+        for name, entry in sorted(offsets.items()):
+            f.write('\t'.join([name] + [str(value) for value in entry]) + '\n')
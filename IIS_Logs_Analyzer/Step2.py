@@ -1,26 +1,81 @@
 import os
-import subprocess
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Log_Tools'))
+import logparse
+import timeindex
 # This gets the Column We need which is the 7th Column, from all of the Files and Creates the SVC2.txt File
+# The column is cut out in Python (same output as cut -d ' ' -f 7) instead of starting a cut
+# process per file, IIS writes a file per site per day so there can be thousands of them.
 # Specify the directory containing your files
 directory = 'RAWLogs'
 output_file = 'Output.txt'
 
+# Optional: only the files with log lines between two dates (YYYY-MM-DD), the rest are skipped
+# i.e. python3 Step2.py 2025-03-14 2025-03-14
+date_from, date_to = (sys.argv[1], sys.argv[2]) if len(sys.argv) == 3 else (None, None)
+index = timeindex.TimeIndex()
+
+# Written by Step1.py --keep: where the log data starts in each file. An offset is only used
+# while the file still has the size and modification time it had then, a file that was
+# stripped or replaced since has no header to skip (or another one).
+header_offsets = {}
+offsets_file = os.path.join(directory, '.header_offsets')
+if os.path.isfile(offsets_file):
+    with open(offsets_file, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != 4:
+                continue  # Saved by an older Step1.py, without the size to check it against
+            name, offset, size, mtime = fields
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            if stat.st_size == int(size) and int(stat.st_mtime) == int(mtime):
+                header_offsets[name] = int(offset)
+
+
+def extract(file_path, start, out_file):
+    # Writes the 7th column of every line after byte offset start, like cut -d ' ' -f 7:
+    # a line without spaces is written as it is, a line with less than 7 columns as a blank line
+    with open(file_path, 'rb') as f:
+        logparse.read_ahead(f, start)
+        f.seek(start)
+        for line in f:
+            line = line.rstrip(b'\n')
+            fields = line.split(b' ', 7)
+            if len(fields) > 6:
+                out_file.write(fields[6] + b'\n')
+            elif len(fields) == 1:
+                out_file.write(line + b'\n')
+            else:
+                out_file.write(b'\n')
+
+
+started = time.monotonic()
+processed = size = 0
 # Open the output file in append mode
-with open(output_file, 'a') as out_file:
+with open(output_file, 'ab') as out_file:
     # Loop through all files in the directory
-    for filename in os.listdir(directory):
+    filenames = [f for f in sorted(os.listdir(directory)) if not f.startswith('.')]
+    for i, filename in enumerate(filenames):
         file_path = os.path.join(directory, filename)
 
         # Check if it's a file (not a subdirectory)
         if os.path.isfile(file_path):
-            # Run the 'cut' command using subprocess
+            if date_from and not timeindex.overlaps(index.span(file_path, 'iis'), date_from, date_to):
+                continue
+            # Start reading the next file from disk while this one is being cut
+            if i + 1 < len(filenames):
+                logparse.prefetch(os.path.join(directory, filenames[i + 1]))
             try:
-                result = subprocess.run(
-                    ['cut', '-d', ' ', '-f', '7', file_path],
-                    text=True, capture_output=True, check=True
-                )
-                # Append the result to the output file
-                out_file.write(result.stdout)
-                print(f'Processed {filename}')
-            except subprocess.CalledProcessError as e:
+                # Files kept as they are by Step1.py --keep are read from after their header
+                extract(file_path, header_offsets.get(filename, 0), out_file)
+                processed += 1
+                size += os.path.getsize(file_path)
+            except OSError as e:
                 print(f"Error processing {filename}: {e}")
+
+print(f'Processed {processed} files ({size / 1048576:.1f} MB) in {time.monotonic() - started:.1f}s')
+index.save()
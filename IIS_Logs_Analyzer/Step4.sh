@@ -1 +1,4 @@
 sort Output2.txt | uniq -c | sort -nr > Analyzed.txt
+
+# Keep a snapshot of the counts so runs can be compared later (../Log_Tools/snapshot.py diff)
+python3 ../Log_Tools/snapshot.py save Analyzed.txt
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import argparse
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import bloomfilter
+import filters
+import logparse
+import sinks
+import timeindex
+# One shot analysis of a RAWLogs folder in a single Python pass, the same result as the
+# Step scripts (Analyzed.txt) but with an optional filter:
+#
+#   python3 ../Log_Tools/analyze.py --analysis iis-endpoints --where "date>=2025-03-01 date<=2025-03-07 status=2xx method=GET"
+#
+# With a date filter, every file is first checked against State/timeindex.json (see
+# timeindex.py) and files that are entirely outside the dates are never read.
+#
+# Several analyses of the same logs are counted in the same pass, each line is read and
+# split up once and every analysis gets its own output (Analyzed.dns-clients.txt...):
+#
+#   python3 ../Log_Tools/analyze.py --analysis dns-clients,dns-domains,dns-qtypes,dns-rcodes
+#
+# --allow/--deny Bloom filters (see bloomfilter.py) are checked while counting: allowlisted
+# keys are never counted, denylisted keys are also written to DenyHits.txt.
+#
+# Files are handed to the worker processes (--jobs) in batches of about 32MB, so a folder
+# of thousands of small IIS files costs about the same as one big file of the same size.
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count the keys for one or more analyses over a folder of logs')
+    parser.add_argument('directory', nargs='?', default='RAWLogs')
+    parser.add_argument('--analysis', required=True, action='append',
+                        help=f'can be repeated or comma separated: {", ".join(sorted(logparse.ANALYSES))}')
+    parser.add_argument('--where', help='filter expression, see filters.py')
+    parser.add_argument('--output', action='append', help='Analyzed.txt by default, can be repeated, see sinks.py for formats')
+    parser.add_argument('--prom-top', type=int, default=sinks.PROM_TOP, help=f'keys exported to .prom outputs (default {sinks.PROM_TOP})')
+    parser.add_argument('--allow', action='append', default=[], help='allowlist .bloom file, can be repeated')
+    parser.add_argument('--deny', action='append', default=[], help='denylist .bloom file, can be repeated')
+    parser.add_argument('--deny-output', default='DenyHits.txt')
+    parser.add_argument('--state-dir', default='State')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes, default one per CPU')
+    args = parser.parse_args()
+    args.output = args.output or ['Analyzed.txt']
+    analyses = list(dict.fromkeys(a for value in args.analysis for a in value.split(',') if a))
+    unknown = [a for a in analyses if a not in logparse.ANALYSES]
+    if unknown:
+        parser.error(f'unknown analysis {", ".join(unknown)}, choose from {", ".join(sorted(logparse.ANALYSES))}')
+    try:
+        fmt = logparse.analyses_format(analyses)
+    except ValueError as e:
+        parser.error(str(e))
+
+    where = None
+    if args.where:
+        try:
+            where = filters.Where(args.where)
+            where.check_format(fmt)
+        except ValueError as e:
+            parser.error(str(e))
+
+    keys = bloomfilter.KeyFilter(args.allow, args.deny) if args.allow or args.deny else None
+
+    index = timeindex.TimeIndex(os.path.join(args.state_dir, 'timeindex.json'))
+    low, high = where.date_range() if where else (None, None)
+    started = time.monotonic()
+    counts = {a: {} for a in analyses}
+    if keys and keys.denies:
+        counts.update((a + '.denied', {}) for a in analyses)
+    paths = []
+    read = skipped = size = 0
+    # Includes sub folders, IIS keeps one folder per site (W3SVC1, W3SVC2...)
+    for path in timeindex.list_files(args.directory):
+        if (low or high) and not timeindex.overlaps(index.span(path, fmt), low, high):
+            skipped += 1
+            continue
+        paths.append(path)
+
+    # Files are counted in batches (many small IIS files make one task), by a pool of
+    # worker processes unless there is only one batch or --jobs 1
+    batches = list(logparse.batches(paths))
+    work = ([batch for batch, _ in batches], repeat(analyses), repeat(where), repeat(keys))
+    pool = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 and len(batches) > 1 else None
+    results = pool.map(logparse.aggregate_batch, *work) if pool else map(logparse.aggregate_batch, *work)
+    for (batch, batch_size), (batch_counts, files) in zip(batches, results):
+        for path, span, error in files:
+            if error:
+                print(f'Error processing {path}: {error}')
+                continue
+            if span:
+                index.set(path, span)
+            read += 1
+        for a, c in batch_counts.items():
+            logparse.merge_counts(counts[a], c)
+        size += batch_size
+        print(f'Processed {len(batch)} files ({batch_size / 1048576:.1f} MB)')
+    if pool:
+        pool.shutdown()
+
+    index.save()
+    print(f'{read} files ({size / 1048576:.1f} MB) read, {skipped} skipped by date in {time.monotonic() - started:.1f}s')
+    for a in analyses:
+        # One analysis keeps the output names as they are, several get the analysis added
+        outputs = args.output if len(analyses) == 1 else [sinks.output_name(p, a) for p in args.output]
+        sinks.write_counts(outputs, counts[a], a, args.prom_top)
+        print(f'{a}: {sum(counts[a].values())} entries, {len(counts[a])} keys -> {", ".join(outputs)}')
+        if keys and keys.denies:
+            hits = args.deny_output if len(analyses) == 1 else sinks.output_name(args.deny_output, a)
+            sinks.write_counts([hits], counts[a + '.denied'], a)
+            print(f'{a}: {len(counts[a + ".denied"])} denylisted keys -> {hits}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import os
+import sys
+import mmap
+import math
+import struct
+import hashlib
+import argparse
+# Bloom filters for allowlists (known good names we don't care about, i.e. Windows Update
+# or our own AD domain) and denylists (threat intel). A list with millions of entries
+# becomes a small bit array file that is mmap'd, so loading it is instant.
+#
+# Build:   python3 ../Log_Tools/bloomfilter.py build Filters/allow.bloom allowlist.txt
+# Filter:  python3 ../Log_Tools/bloomfilter.py filter Output.txt --allow Filters/allow.bloom --deny Filters/deny.bloom
+#
+# analyze.py and watcher.py take the same --allow/--deny and apply them while counting
+# (KeyFilter, used by logparse.aggregate_multi), so allowlisted keys are never counted at all.
+#
+# A Bloom filter never misses an entry that is in the list, but can (rarely, see --fp)
+# match one that isn't. Names are checked together with their parent domains, so
+# windowsupdate.com in the list also matches dl.delivery.mp.microsoft.windowsupdate.com.
+
+MAGIC = b'LOGBLOOM'
+HEADER = struct.Struct('<8sQII')  # magic, bits, hash count, reserved
+
+
+def dns_name(key):
+    # DNS debug logs write names as (3)www(6)google(3)com(0)
+    if key.startswith('('):
+        parts = []
+        for part in key.split(')')[1:]:
+            parts.append(part.split('(', 1)[0])
+        key = '.'.join(p for p in parts if p)
+    return key.strip().rstrip('.').lower()
+
+
+def candidates(key):
+    # The name itself and each parent domain (not for IP addresses)
+    yield key
+    if not key.replace('.', '').isdigit():
+        while '.' in key:
+            key = key.split('.', 1)[1]
+            if '.' in key:
+                yield key
+
+
+def positions(key, bits, hashes):
+    # Double hashing: two 64 bit halves of one blake2b digest give all k positions
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    h1, h2 = struct.unpack('<QQ', digest)
+    h2 |= 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class BloomFilter:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.bits, self.hashes, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a bloom filter file')
+
+    def __contains__(self, key):
+        data = self.map
+        for pos in positions(key, self.bits, self.hashes):
+            if not data[HEADER.size + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def matches(self, key):
+        # True if the name or any of its parent domains is in the list
+        return any(c in self for c in candidates(key))
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class KeyFilter:
+    # Allowlist/denylist check for the keys counted by logparse.aggregate_multi. Only the paths
+    # are kept until the first check, so it can be handed to worker processes (an mmap can't
+    # be pickled), each worker opens the filters itself.
+    CACHE_SIZE = 1000000  # keys repeat a lot, remember the answer for this many
+
+    def __init__(self, allow=(), deny=()):
+        self.allow_paths = list(allow)
+        self.deny_paths = list(deny)
+        self.filters = None
+        self.cache = {}
+
+    def __getstate__(self):
+        return {'allow_paths': self.allow_paths, 'deny_paths': self.deny_paths, 'filters': None, 'cache': {}}
+
+    def check(self, key):
+        # (count the key, key is on a denylist)
+        result = self.cache.get(key)
+        if result is None:
+            if self.filters is None:
+                self.filters = ([BloomFilter(p) for p in self.allow_paths], [BloomFilter(p) for p in self.deny_paths])
+            allow, deny = self.filters
+            name = dns_name(key)
+            result = (not any(b.matches(name) for b in allow), any(b.matches(name) for b in deny))
+            if len(self.cache) >= self.CACHE_SIZE:
+                self.cache.clear()
+            self.cache[key] = result
+        return result
+
+    @property
+    def denies(self):
+        return bool(self.deny_paths)
+
+
+def read_list(paths):
+    # One entry per line, blank lines and # comments are skipped
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    yield dns_name(line)
+
+
+def build(output, paths, fp_rate):
+    n = max(sum(1 for _ in read_list(paths)), 1)
+    # Standard sizing: m = -n ln(p) / ln(2)^2, k = -log2(p)
+    bits = max(int(-n * math.log(fp_rate) / (math.log(2) ** 2)), 64)
+    bits = (bits + 7) // 8 * 8
+    hashes = max(int(round(-math.log2(fp_rate))), 1)
+    array = bytearray(bits // 8)
+    for key in read_list(paths):
+        for pos in positions(key, bits, hashes):
+            array[pos >> 3] |= 1 << (pos & 7)
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    tmp = output + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, bits, hashes, 0))
+        f.write(array)
+    os.replace(tmp, output)
+    print(f'Built {output}: {n} entries, {bits // 8} bytes, {hashes} hashes, ~{fp_rate} false positive rate')
+
+
+def filter_file(path, allow, deny, deny_output):
+    # Rewrites an Output.txt (one key per line) without the allowlisted keys.
+    # Keys on the denylist are also written to deny_output.
+    allow = [BloomFilter(p) for p in allow]
+    deny = [BloomFilter(p) for p in deny]
+    kept = dropped = flagged = 0
+    tmp = path + '.tmp'
+    with open(path, 'r', encoding='utf-8', errors='replace') as src, \
+            open(tmp, 'w') as out, open(deny_output, 'a') as hits:
+        for line in src:
+            key = dns_name(line)
+            if any(b.matches(key) for b in deny):
+                hits.write(line)
+                flagged += 1
+            if any(b.matches(key) for b in allow):
+                dropped += 1
+                continue
+            out.write(line)
+            kept += 1
+    os.replace(tmp, path)
+    for b in allow + deny:
+        b.close()
+    print(f'Kept {kept}, dropped {dropped} allowlisted, {flagged} denylist hits written to {deny_output}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and apply allowlist/denylist Bloom filters')
+    sub = parser.add_subparsers(dest='command', required=True)
+    b = sub.add_parser('build', help='build a filter file from one or more list files')
+    b.add_argument('output')
+    b.add_argument('lists', nargs='+')
+    b.add_argument('--fp', type=float, default=0.0001, help='false positive rate (default 0.0001)')
+    f = sub.add_parser('filter', help='drop allowlisted keys from an Output.txt')
+    f.add_argument('output_txt')
+    f.add_argument('--allow', action='append', default=[])
+    f.add_argument('--deny', action='append', default=[])
+    f.add_argument('--deny-output', default='DenyHits.txt')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.output, args.lists, args.fp)
+    else:
+        filter_file(args.output_txt, args.allow, args.deny, args.deny_output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+# Finds log files that were already counted, so the same bytes are not counted twice:
+#   - the same IIS file copied into RAWLogs twice under different names
+#   - a DNS.log copy that starts with everything from the previous DNS.log copy
+#   - an older DNS.log copy that arrives after the newer one that contains it
+#
+# Each counted file gets a fingerprint: its size, a hash of a few sampled blocks and a
+# hash per BLOCK of content. A new file is first compared on size + sampled blocks (cheap,
+# no full read). Only when that matches, or its first bytes match another file, are the
+# block hashes of the new file computed to confirm it. The fingerprints are indexed by the
+# hash of their first bytes, so finding the related files costs one read of the new file's
+# first SAMPLE bytes and a dict lookup, however many files were counted before.
+#
+#   python3 ../Log_Tools/dedup.py RAWLogs                          report only
+#   python3 ../Log_Tools/dedup.py RAWLogs --move-duplicates Dups   move exact copies out
+#   python3 ../Log_Tools/dedup.py RAWLogs --trim-overlaps          cut already counted prefixes
+#
+# watcher.py uses this automatically and just skips the duplicate bytes.
+
+BLOCK = 4 * 1024 * 1024
+SAMPLE = 64 * 1024
+PREFIX = 1024  # files shorter than SAMPLE are indexed on this many bytes
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def sample_hash(path, size):
+    # Size plus blocks from the start, middle and end of the file
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        for pos in sorted({0, size // 4, size // 2, size * 3 // 4, max(size - SAMPLE, 0)}):
+            f.seek(pos)
+            h.update(f.read(SAMPLE))
+    return h.hexdigest()
+
+
+def head_hash(path, size):
+    # Hash of the first SAMPLE bytes (or the whole file if it is smaller)
+    with open(path, 'rb') as f:
+        return digest(f.read(min(size, SAMPLE)))
+
+
+def block_hashes(path, size, known=None, known_size=0):
+    # Hash of every full BLOCK, plus the partial block at the end.
+    # known are the hashes from when the file was known_size bytes, its full blocks are not read again.
+    blocks = list(known[:min(known_size, size) // BLOCK]) if known else []
+    pos = len(blocks) * BLOCK
+    with open(path, 'rb') as f:
+        f.seek(pos)
+        while pos < size:
+            data = f.read(min(BLOCK, size - pos))
+            if not data:
+                break
+            blocks.append(digest(data))
+            pos += len(data)
+    return blocks
+
+
+def line_start(path, offset):
+    # A copy taken while the log was being written can end halfway through a line, and that
+    # partial line was never counted. Back up to the end of the last complete line.
+    with open(path, 'rb') as f:
+        start = max(offset - SAMPLE, 0)
+        f.seek(start)
+        newline = f.read(offset - start).rfind(b'\n')
+    return start + newline + 1 if newline >= 0 else 0
+
+
+class Fingerprints:
+    def __init__(self, path):
+        self.path = path
+        self.records = {}  # file path -> {size, sample, head, blocks}
+        self.by_head = {}  # hash of the first SAMPLE bytes -> paths, files of SAMPLE bytes or more
+        self.by_prefix = {}  # hash of the first PREFIX bytes -> paths, files from PREFIX to SAMPLE bytes
+        self.tiny = {}     # size -> head -> paths, files under PREFIX bytes (at most PREFIX sizes)
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self.records = json.load(f)
+        for p in list(self.records):
+            self._index(p)
+
+    def _bucket(self, path):
+        # The index entry a record belongs in. Files between PREFIX and SAMPLE bytes get the
+        # hash of their first PREFIX bytes saved with them the first time ('prefix').
+        r = self.records[path]
+        if r['size'] >= SAMPLE:
+            return self.by_head.setdefault(r['head'], set())
+        if r['size'] >= PREFIX:
+            if not r.get('prefix'):
+                r['prefix'] = head_hash(path, PREFIX)
+            return self.by_prefix.setdefault(r['prefix'], set())
+        return self.tiny.setdefault(r['size'], {}).setdefault(r['head'], set())
+
+    def _index(self, path):
+        try:
+            self._bucket(path).add(path)
+        except OSError:
+            pass  # File is gone and there is no prefix saved for it, it can't match anything
+
+    def _unindex(self, path):
+        r = self.records.get(path)
+        if r and (r['size'] >= SAMPLE or r['size'] < PREFIX or r.get('prefix')):
+            self._bucket(path).discard(path)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.records, f)
+        os.replace(tmp, self.path)
+
+    def check(self, path):
+        # Returns (bytes at the start of path that were already counted, the file they came from).
+        # Returns (None, None) when it looks like a file that is still being counted, ask again later.
+        size = os.path.getsize(path)
+        if size == 0:
+            return 0, None
+
+        # Only files that start with the same bytes can be related, the rest are ignored
+        with open(path, 'rb') as f:
+            head = f.read(SAMPLE)
+        candidates = set()
+        if size >= SAMPLE:
+            candidates.update(self.by_head.get(digest(head), ()))
+        if size >= PREFIX:
+            # Files shorter than SAMPLE: same first PREFIX bytes, then the whole of them
+            candidates.update(p for p in self.by_prefix.get(digest(head[:PREFIX]), ())
+                              if self.records[p]['size'] <= size and
+                              digest(head[:self.records[p]['size']]) == self.records[p]['head'])
+        for length, heads in self.tiny.items():
+            if length <= size:
+                candidates.update(heads.get(digest(head[:length]), ()))
+        candidates.discard(path)
+        related = [(p, self.records[p]) for p in sorted(candidates)]
+        if any(r['blocks'] is None for p, r in related):
+            return None, None
+
+        # Exact copy: same size and sampled blocks, confirmed with the block hashes
+        same = [(p, r) for p, r in related if r['size'] == size]
+        if same:
+            sample = sample_hash(path, size)
+            same = [(p, r) for p, r in same if r['sample'] == sample]
+        if same:
+            blocks = block_hashes(path, size)
+            for p, r in same:
+                if r['blocks'] == blocks:
+                    return size, p
+
+        # Older copy: a bigger file that was already counted starts with all of this one
+        for p, r in related:
+            if r['size'] > size and os.path.isfile(p):
+                if block_hashes(p, size) == block_hashes(path, size):
+                    return size, p
+
+        # Newer copy: an older, smaller file is the start of this one
+        for p, r in sorted(related, key=lambda pr: -pr[1]['size']):
+            if r['size'] < size and block_hashes(path, r['size']) == r['blocks']:
+                return line_start(path, r['size']), p
+        return 0, None
+
+    def record(self, path):
+        # Called after a file has been counted
+        size = os.path.getsize(path)
+        old = self.records.get(path)
+        known, known_size = (old['blocks'], old['size']) if old and old['blocks'] and old['size'] <= size else (None, 0)
+        self._unindex(path)
+        self.records[path] = {
+            'size': size,
+            'sample': sample_hash(path, size),
+            'head': head_hash(path, size),
+            'blocks': block_hashes(path, size, known, known_size),
+        }
+        self._index(path)
+
+    def pending(self, path):
+        # Cheap part of the fingerprint, for a file handed out to be counted. Files that
+        # look like it wait (check returns None) until record() is called with the rest.
+        size = os.path.getsize(path)
+        self._unindex(path)
+        self.records[path] = {
+            'size': size,
+            'sample': sample_hash(path, size),
+            'head': head_hash(path, size),
+            'blocks': None,
+        }
+        self._index(path)
+
+    def forget(self, path):
+        self._unindex(path)
+        self.records.pop(path, None)
+
+
+def trim(path, skip):
+    # Streams everything after skip bytes into a new file, constant memory
+    tmp = path + '.trim'
+    with open(path, 'rb') as src, open(tmp, 'wb') as out:
+        src.seek(skip)
+        shutil.copyfileobj(src, out, BLOCK)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find duplicated or overlapping log copies')
+    parser.add_argument('directory')
+    parser.add_argument('--fingerprints', default='State/fingerprints.json')
+    parser.add_argument('--move-duplicates', metavar='DIR', help='move exact copies to this folder')
+    parser.add_argument('--trim-overlaps', action='store_true', help='remove already counted bytes from the start of overlapping files')
+    args = parser.parse_args()
+
+    prints = Fingerprints(args.fingerprints)
+    files = [os.path.join(args.directory, f) for f in os.listdir(args.directory) if not f.startswith('.')]
+    # Oldest first, so the earlier copy is the one that is kept
+    files = sorted((f for f in files if os.path.isfile(f)), key=os.path.getmtime)
+
+    for path in files:
+        size = os.path.getsize(path)
+        if prints.records.get(path, {}).get('size') == size:
+            continue  # Already checked on an earlier run
+        skip, original = prints.check(path)
+        if skip and skip == size:
+            print(f'Duplicate {path} (already counted from {original})')
+            if args.move_duplicates:
+                os.makedirs(args.move_duplicates, exist_ok=True)
+                shutil.move(path, os.path.join(args.move_duplicates, os.path.basename(path)))
+            continue
+        if skip:
+            print(f'Overlap {path}: first {skip} of {size} bytes are {original}')
+            if args.trim_overlaps:
+                trim(path, skip)
+                print(f'Trimmed {path}')
+        prints.record(path)
+
+    prints.save()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+import re
+import logparse
+# Filter expressions, so a question like "only 2xx GETs last week" doesn't need grep first.
+#
+#   date>=2025-03-01 date<=2025-03-07 status=2xx method=GET client=10.0.*
+#
+# Terms are separated by spaces and all of them have to match (and is allowed between them).
+# Operators: = != >= <= > <. For = and != several values can be given with commas, and a
+# value ending in * or x (10.0.*, 2xx) matches everything that starts with the rest.
+#
+# The expression is turned into two checks once, up front: a cheap one on the raw line
+# (the date, which is at the start of every line) that runs before the line is split,
+# and one on the split up columns for everything else.
+#
+# Columns: date, time (both formats), client, plus site, method, uri, status (IIS) and
+# protocol, direction, packet, opcode, flags, rcode, qtype, domain (DNS, see logparse.dns_record).
+
+TERM = re.compile(r'^([a-z]+)(>=|<=|!=|=|>|<)(.+)$')
+COLUMNS = {
+    'dns': {'date', 'time', 'client', 'protocol', 'direction', 'packet', 'opcode', 'flags', 'rcode', 'qtype', 'domain'},
+    'iis': {'date', 'time', 'client', 'site', 'method', 'uri', 'status'},
+}
+
+
+def compare(op, value):
+    # Returns a function that checks a column value against value
+    if op in ('=', '!='):
+        exact, prefixes = set(), []
+        for v in value.split(','):
+            if v.endswith('*'):
+                prefixes.append(v[:-1])
+            elif v.endswith('x') and v.rstrip('x').isdigit():
+                prefixes.append(v.rstrip('x'))
+            else:
+                exact.add(v)
+        prefixes = tuple(prefixes)
+        if op == '=':
+            return lambda v: v in exact or v.startswith(prefixes)
+        return lambda v: not (v in exact or v.startswith(prefixes))
+    if value.isdigit():
+        # Numbers compare as numbers (status>=400)
+        number = int(value)
+        return {
+            '>=': lambda v: v.isdigit() and int(v) >= number,
+            '<=': lambda v: v.isdigit() and int(v) <= number,
+            '>': lambda v: v.isdigit() and int(v) > number,
+            '<': lambda v: v.isdigit() and int(v) < number,
+        }[op]
+    # Everything else compares as text, which works for dates and times
+    return {
+        '>=': lambda v: v >= value,
+        '<=': lambda v: v <= value,
+        '>': lambda v: v > value,
+        '<': lambda v: v < value,
+    }[op]
+
+
+class Where:
+    def __init__(self, expression):
+        self.expression = expression
+        self.terms = []
+        for word in expression.split():
+            if word.lower() == 'and':
+                continue
+            m = TERM.match(word)
+            if not m:
+                raise ValueError(f'Bad filter term: {word}')
+            self.terms.append(m.groups())
+        self.names = {name for name, _, _ in self.terms}
+
+    def date_range(self):
+        # (first date, last date) that can match, None for an open end. Files whose span (see
+        # timeindex.py) is outside it are skipped with timeindex.overlaps.
+        low = high = None
+        for name, op, value in self.terms:
+            if name != 'date':
+                continue
+            if op in ('>=', '>', '=') and ',' not in value and '*' not in value:
+                low = max(low or value, value)
+            if op in ('<=', '<', '=') and ',' not in value and '*' not in value:
+                high = min(high or value, value)
+        return low, high
+
+    def check_format(self, fmt):
+        unknown = self.names - COLUMNS[fmt]
+        if unknown:
+            raise ValueError(f'{fmt} logs have no {", ".join(sorted(unknown))} column')
+
+    def line_check(self, fmt):
+        # The date checks, run on the raw line before it is split
+        self.check_format(fmt)
+        checks = [compare(op, value) for name, op, value in self.terms if name == 'date']
+        if not checks:
+            return None
+        line_date = logparse.FORMATS[fmt]['line_date']
+        if len(checks) == 1:
+            check = checks[0]
+            return lambda line: check(line_date(line))
+
+        def line_ok(line):
+            date = line_date(line)
+            return all(c(date) for c in checks)
+        return line_ok
+
+    def fields_check(self, fmt):
+        # Everything but the date, run on the split up line
+        self.check_format(fmt)
+        timestamp = logparse.FORMATS[fmt]['timestamp']
+        checks = []
+        for name, op, value in self.terms:
+            if name == 'date':
+                continue
+            check = compare(op, value)
+            if name == 'time':
+                # DNS times are 12 hour, so compare the 24 hour time from the timestamp
+                checks.append((lambda c: lambda f, cols: c(timestamp(f, cols)[11:]))(check))
+            else:
+                checks.append((lambda c, n: lambda f, cols: c(f[cols[n]]))(check, name))
+        if not checks:
+            return None
+
+        def fields_ok(fields, columns):
+            for c in checks:
+                if not c(fields, columns):
+                    return False
+            return True
+        return fields_ok
+
+    def require(self, columns, path):
+        missing = {n for n in self.names if n not in ('date', 'time')} - set(columns)
+        if missing:
+            raise ValueError(f'{path} has no {", ".join(sorted(missing))} column')
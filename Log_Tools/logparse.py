@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+import os
+import json
+import snapshot
+# Shared log parsing for the tools in Log_Tools. Each analysis pulls one key out of a
+# log line, the same column the Step scripts pull out with cut/awk:
+#
+#   dns-clients    DNS_Log_Analyzer               cut -d ' ' -f 10
+#   dns-domains    DNS_LOG_Analyzer_Domain_Names  awk '{print $NF}'
+#   iis-endpoints  IIS_Logs_Analyzer              cut -d ' ' -f 7 | cut -d'/' -f1-2
+#   dns-qtypes     record type asked for (A, AAAA, PTR...)
+#   dns-rcodes     response code (NOERROR, NXDOMAIN...)
+#   dns-nxdomain-clients  clients sent an NXDOMAIN answer
+#
+# Several analyses of the same log format can be counted from one pass (aggregate_multi),
+# every line is read and split up once however many analyses use it.
+#
+# Keys can be checked against allowlist/denylist Bloom filters while counting (keys, see
+# bloomfilter.KeyFilter): allowlisted keys are not counted, denylisted ones are also counted
+# under '<analysis>.denied'.
+#
+# Header lines (the 30 DNS header lines, IIS # lines) and blank lines are skipped here,
+# so the raw log files can be read without running Step1/Step2 first.
+
+# DNS lines are split up into a record (see dns_record) with the columns in these positions
+DNS_COLUMNS = {'date': 0, 'time': 1, 'ampm': 2, 'protocol': 3, 'direction': 4, 'client': 5, 'xid': 6,
+               'packet': 7, 'opcode': 8, 'flagbits': 9, 'flags': 10, 'rcode': 11, 'qtype': 12, 'domain': 13}
+
+# IIS files say where their columns are in the #Fields: line at the top. Files that lost it
+# (Step1.py removes it) use IIS_FIELDS, which has cs-uri-stem in Position 7 like the Readme.
+IIS_FIELDS = ['date', 'time', 's-sitename', 's-computername', 's-ip', 'cs-method', 'cs-uri-stem',
+              'cs-uri-query', 's-port', 'cs-username', 'c-ip', 'cs(User-Agent)', 'cs(Referer)',
+              'sc-status', 'sc-substatus', 'sc-win32-status', 'time-taken']
+IIS_NAMES = {'date': 'date', 'time': 'time', 'site': 's-sitename', 'method': 'cs-method',
+             'uri': 'cs-uri-stem', 'client': 'c-ip', 'status': 'sc-status'}
+
+
+def iis_columns(fields):
+    return {name: fields.index(field) for name, field in IIS_NAMES.items() if field in fields}
+
+
+dns_dates = {}
+
+
+def dns_date(text):
+    # 3/14/2025 -> 2025-03-14, so dates sort and compare as text
+    iso = dns_dates.get(text)
+    if iso is None:
+        try:
+            m, d, y = text.split('/')
+            iso = f'{int(y):04d}-{int(m):02d}-{int(d):02d}'
+        except ValueError:
+            iso = ''
+        dns_dates[text] = iso
+    return iso
+
+
+def dns_record(line):
+    # Splits up a DNS debug log packet line:
+    #
+    #   3/14/2025 10:15:02 AM 0A3C PACKET  000001D2C3B4E5F0 UDP Rcv 10.0.0.1   a1b2   Q [0001   D   NOERROR] A      (3)www(6)google(3)com(0)
+    #   3/14/2025 10:15:02 AM 0A3C PACKET  000001D2C3B4E5F0 UDP Snd 10.0.0.1   a1b2 R Q [8183   DR NXDOMAIN] A      (3)www(6)google(3)com(0)
+    #
+    # Everything around the [flags rcode] part is at a fixed place from the [, so only the start
+    # of the line (date to client) and the end (qtype, name) need splitting. Lines that don't
+    # have that layout go through the slower tokenizer instead.
+    # Returns [date, time, ampm, protocol, direction, client, xid, packet (query/response),
+    #          opcode, flag bits (hex), flags (AATC/RD/RA letters), rcode, qtype, domain].
+    b = line.find(' [') + 1
+    close = line.find(']', b)
+    if b < 10 or close < b + 12 or line[b + 5] != ' ' or line[b + 10] != ' ' or line[b - 1] != ' ' \
+            or line[b - 3] != ' ' or line[b - 5] != ' ':
+        return dns_tokens(line)
+    head = line[:b - 9].split()
+    tail = line[close + 1:].split()
+    if len(head) < 9 or len(tail) != 2:
+        return dns_tokens(line)
+    return [head[0], head[1], head[2], head[-3], head[-2], head[-1], line[b - 9:b - 5],
+            'response' if line[b - 4] == 'R' else 'query', line[b - 2], line[b + 1:b + 5],
+            line[b + 6:b + 10].replace(' ', ''), line[b + 11:close].strip(), tail[0], tail[1]]
+
+
+def dns_tokens(line):
+    # The slow way, for lines dns_record can't take apart by position
+    words = line.split()
+    if 'PACKET' not in words[:5]:
+        raise IndexError('not a packet line')  # Other debug log events
+    opening = [i for i, w in enumerate(words) if w.startswith('[')]
+    closing = [j for j, w in enumerate(words) if w.endswith(']')]
+    directions = [d for d, w in enumerate(words) if w in ('Rcv', 'Snd')]
+    if not opening or not closing or not directions:
+        raise IndexError('no flags or direction')
+    i, j, d = opening[0], closing[0], directions[0]
+    inside = ' '.join(words[i:j + 1])[1:-1].split()
+    if len(inside) < 2 or len(words) - j < 3 or d + 2 >= i:
+        raise IndexError('short line')
+    packet = 'response' if words[i - 2] == 'R' else 'query'
+    return [words[0], words[1], words[2], words[d - 1], words[d], words[d + 1], words[d + 2],
+            packet, words[i - 1], inside[0], ''.join(inside[1:-1]), inside[-1], words[j + 1], words[-1]]
+
+
+def dns_timestamp(fields, columns):
+    h, rest = fields[columns['time']].split(':', 1)
+    h = int(h) % 12 + (12 if fields[columns['ampm']] == 'PM' else 0)
+    return f'{dns_date(fields[columns["date"]])} {h:02d}:{rest}'
+
+
+def iis_timestamp(fields, columns):
+    return fields[columns['date']] + ' ' + fields[columns['time']]
+
+
+def dns_line_timestamp(line, columns):
+    # Every DNS debug log line (packets and the other events) starts with the date, time and
+    # AM/PM, so only those three words are split off
+    stamp = dns_timestamp(line.split(' ', 3), DNS_COLUMNS)
+    if not stamp[:1].isdigit():
+        raise ValueError('no date')
+    return stamp
+
+
+FORMATS = {
+    'dns': {
+        # Log lines start with the date, header lines don't
+        'record': lambda line: line[:1].isdigit(),
+        'split': dns_record,
+        'line_date': lambda line: dns_date(line[:line.find(' ')]),
+        'timestamp': dns_timestamp,
+        'line_timestamp': dns_line_timestamp,
+    },
+    'iis': {
+        'record': lambda line: line[:1] not in ('#', ''),
+        'split': lambda line: line.split(' '),
+        'line_date': lambda line: line[:10],
+        'timestamp': iis_timestamp,
+        'line_timestamp': lambda line, columns: iis_timestamp(line.split(' '), columns),
+    },
+}
+
+# analysis -> (log format, function(fields, columns) returning the key, or None to not count the line)
+ANALYSES = {
+    'dns-clients': ('dns', lambda f, c: f[c['client']]),
+    'dns-domains': ('dns', lambda f, c: f[-1]),
+    'iis-endpoints': ('iis', lambda f, c: '/'.join(f[c['uri']].split('/', 2)[:2])),
+    'dns-qtypes': ('dns', lambda f, c: f[c['qtype']]),
+    'dns-rcodes': ('dns', lambda f, c: f[c['rcode']]),
+    # NXDOMAIN answers sent back to a client (not the ones received from a forwarder)
+    'dns-nxdomain-clients': ('dns', lambda f, c: f[c['client']] if f[c['rcode']] == 'NXDOMAIN' and
+                             f[c['direction']] == 'Snd' and f[c['packet']] == 'response' else None),
+}
+
+
+def analyses_format(analyses):
+    # The log format shared by all the analyses, ValueError if they are for different logs
+    formats = {ANALYSES[a][0] for a in analyses}
+    if len(formats) != 1:
+        raise ValueError(f'{", ".join(analyses)} are not for the same kind of log')
+    return formats.pop()
+
+
+def file_columns(f, fmt):
+    # Reads the #Fields: header from the top of an open file, then goes back to where it was
+    if fmt == 'dns':
+        return dict(DNS_COLUMNS)
+    columns = iis_columns(IIS_FIELDS)
+    pos = f.tell()
+    f.seek(0)
+    for raw in f:
+        if not raw.startswith(b'#'):
+            break
+        if raw.startswith(b'#Fields:'):
+            columns = iis_columns(raw.decode('utf-8', 'replace').split()[1:])
+    f.seek(pos)
+    return columns
+
+
+# Time buckets: how much of the timestamp (YYYY-MM-DD HH:MM:SS) is kept
+BUCKETS = {'day': 10, 'hour': 13, 'minute': 16}
+
+# Batches for the worker processes: IIS writes one small file per site per day, so files
+# are handed out in batches of about BATCH_BYTES (at most BATCH_FILES files) to keep the
+# per task overhead small. PREFETCH_BYTES of the next file in a batch is read ahead.
+BATCH_BYTES = 32 * 1024 * 1024
+BATCH_FILES = 500
+PREFETCH_BYTES = 8 * 1024 * 1024
+
+
+def aggregate_file(path, analysis, start=0, where=None, bucket=None):
+    # Counts the keys from the complete lines after byte offset start, only counting the
+    # lines that match the where filter (see filters.py). With a bucket the counts are
+    # per (time bucket, key) instead of per key.
+    # Returns (counts, offset after the last complete line, (first, last) timestamp or None).
+    counts, end, span = aggregate_multi(path, (analysis,), start, where, bucket)
+    return counts[analysis], end, span
+
+
+def aggregate_multi(path, analyses, start=0, where=None, bucket=None, keys=None):
+    # aggregate_file for several analyses of the same log format in one pass, each line is
+    # decoded, filtered and split once and then handed to every analysis.
+    # Returns ({analysis: counts}, offset after the last complete line, span). With a keys
+    # filter that has a denylist there is also {'<analysis>.denied': counts} for each analysis.
+    fmt = analyses_format(analyses)
+    extracts = [(ANALYSES[a][1], {}, {}) for a in analyses]
+    record = FORMATS[fmt]['record']
+    split = FORMATS[fmt]['split']
+    timestamp = FORMATS[fmt]['timestamp']
+    width = BUCKETS[bucket] if bucket else None
+    line_ok = where.line_check(fmt) if where else None
+    fields_ok = where.fields_check(fmt) if where else None
+    end = start
+    first = last = None
+    with open(path, 'rb') as f:
+        read_ahead(f, start)
+        columns = file_columns(f, fmt)
+        if where:
+            where.require(columns, path)
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break  # Line still being written, pick it up next time
+            end += len(raw)
+            line = raw.decode('utf-8', 'replace').rstrip()
+            if not record(line):
+                if line.startswith('#Fields:'):
+                    columns = iis_columns(line.split()[1:])  # IIS restarted and wrote a new header
+                continue
+            if first is None:
+                first = line
+            last = line
+            # Cheap checks on the raw line (i.e. the date) before splitting it up
+            if line_ok and not line_ok(line):
+                continue
+            try:
+                fields = split(line)
+                if fields_ok and not fields_ok(fields, columns):
+                    continue
+                stamp = timestamp(fields, columns)[:width] if width else None
+            except (IndexError, KeyError, ValueError):
+                continue  # Short or garbled line
+            for extract, counts, denied in extracts:
+                try:
+                    key = extract(fields, columns)
+                except (IndexError, KeyError, ValueError):
+                    continue  # Short or garbled line
+                if key is None:
+                    continue
+                if keys:
+                    count, flagged = keys.check(key)
+                    if flagged:
+                        k = (stamp, key) if width else key
+                        denied[k] = denied.get(k, 0) + 1
+                    if not count:
+                        continue
+                if width:
+                    key = (stamp, key)
+                counts[key] = counts.get(key, 0) + 1
+    counts = {a: c for a, (_, c, _) in zip(analyses, extracts)}
+    if keys and keys.denies:
+        counts.update((a + '.denied', d) for a, (_, _, d) in zip(analyses, extracts))
+    return counts, end, line_span(fmt, first, last, columns)
+
+
+def aggregate_batch(paths, analyses, where=None, keys=None):
+    # Counts a batch of files in one go (one worker task for many small files, see analyze.py).
+    # The next file is prefetched while the current one is counted.
+    # Returns ({analysis: counts}, [(path, span, error message or None)]).
+    counts = {}
+    results = []
+    for i, path in enumerate(paths):
+        if i + 1 < len(paths):
+            prefetch(paths[i + 1])
+        try:
+            file_counts, _, span = aggregate_multi(path, analyses, where=where, keys=keys)
+        except (OSError, ValueError) as e:
+            results.append((path, None, str(e)))
+            continue
+        for a, c in file_counts.items():
+            merge_counts(counts.setdefault(a, {}), c)
+        results.append((path, span, None))
+    return counts, results
+
+
+def batches(paths, batch_bytes=BATCH_BYTES, batch_files=BATCH_FILES):
+    # Groups files into batches of about batch_bytes, a big file gets a batch of its own
+    batch, size = [], 0
+    for path in paths:
+        try:
+            file_size = os.path.getsize(path)
+        except OSError:
+            file_size = 0
+        if batch and (size + file_size > batch_bytes or len(batch) >= batch_files):
+            yield batch, size
+            batch, size = [], 0
+        batch.append(path)
+        size += file_size
+    if batch:
+        yield batch, size
+
+
+def read_ahead(f, start=0):
+    # Tells the kernel the file is read start to end, so it reads ahead in bigger chunks.
+    # posix_fadvise is not there on Windows or macOS, the hint is just skipped.
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(f.fileno(), start, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def prefetch(path):
+    # Starts reading (the start of) a file into the page cache in the background
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, PREFETCH_BYTES, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def line_span(fmt, first, last, columns):
+    # First and last timestamp from the first and last log line, None if there are none.
+    # Only the timestamp is parsed, so lines that aren't counted (DNS events other than
+    # packets) still give the file its span.
+    if first is None:
+        return None
+    timestamp = FORMATS[fmt]['line_timestamp']
+    try:
+        return timestamp(first, columns), timestamp(last, columns)
+    except (IndexError, KeyError, ValueError):
+        return None
+
+
+def merge_counts(total, counts):
+    for key, n in counts.items():
+        total[key] = total.get(key, 0) + n
+
+
+class State:
+    # Persisted totals for one analysis plus how far each log file has been read.
+    # The totals are kept as a snapshot file (see snapshot.py), so they can be diffed too.
+    def __init__(self, state_dir, analysis):
+        os.makedirs(state_dir, exist_ok=True)
+        self.counts_path = os.path.join(state_dir, analysis + '.snap')
+        self.offsets_path = os.path.join(state_dir, analysis + '.offsets.json')
+        self.counts = {}
+        self.offsets = {}
+        if os.path.isfile(self.counts_path):
+            for key, n in snapshot.read_snapshot(self.counts_path):
+                self.counts[key.decode('utf-8', 'replace')] = n
+        if os.path.isfile(self.offsets_path):
+            with open(self.offsets_path, 'r') as f:
+                self.offsets = json.load(f)
+
+    def start_offset(self, path):
+        done = self.offsets.get(path, 0)
+        if os.path.getsize(path) < done:
+            return 0  # File was truncated or replaced, start over
+        return done
+
+    def add(self, path, counts, end):
+        merge_counts(self.counts, counts)
+        self.offsets[path] = end
+
+    def save(self):
+        snapshot.write_snapshot(self.counts_path, ((k.encode('utf-8'), n) for k, n in self.counts.items()))
+        tmp = self.offsets_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.offsets, f, indent=1)
+        os.replace(tmp, self.offsets_path)
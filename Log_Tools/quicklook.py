@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import logparse
+# Quick look: a rough top N from a huge RAWLogs folder in seconds, by reading only a
+# sample of it. The data is cut into units, small files whole and CHUNK sized slices of the
+# bigger ones, and the units are grouped by size (strata). The same fraction of the units
+# of every stratum is picked at random and read with seek(), the rest is never read.
+#
+#   python3 ../Log_Tools/quicklook.py --analysis dns-domains RAWLogs --percent 1
+#
+# Counts and shares are estimates (each unit read stands for N/n units of its stratum),
+# printed with approximate 95% confidence intervals worked out from how much the units of
+# the same stratum disagree with each other.
+
+CHUNK = 256 * 1024
+Z95 = 1.96
+MIN_UNITS = 2  # per stratum, so its variance can be estimated
+
+
+def plan(files, budget, chunk):
+    # Returns (units to read as (path, offset, length, stratum), {stratum: (N, n)}).
+    # Small files are a unit of their own, in strata by size (powers of 2), the slices of
+    # the bigger files are all in one stratum. Every stratum gets the budget's share of its
+    # units (proportional allocation), at least MIN_UNITS.
+    total = sum(size for _, size in files)
+    strata = {}
+    for path, size in files:
+        if size <= chunk:
+            strata.setdefault(size.bit_length(), []).append((path, 0, size))
+        else:
+            strata.setdefault('chunks', []).extend((path, offset, min(chunk, size - offset))
+                                                   for offset in range(0, size, chunk))
+    fraction = min(budget / total, 1.0) if total else 0
+    units, sizes = [], {}
+    for stratum, members in strata.items():
+        n = min(len(members), max(MIN_UNITS, int(round(len(members) * fraction))))
+        units.extend(unit + (stratum,) for unit in random.sample(members, n))
+        sizes[stratum] = (len(members), n)
+    return units, sizes
+
+
+def read_chunk(path, offset, length, analysis, columns):
+    # Counts the lines that start inside [offset, offset + length), so every line belongs to
+    # exactly one unit. columns come from the file's header (logparse.file_columns), read
+    # once per file.
+    fmt, extract = logparse.ANALYSES[analysis]
+    record = logparse.FORMATS[fmt]['record']
+    split = logparse.FORMATS[fmt]['split']
+    with open(path, 'rb') as f:
+        if offset:
+            f.seek(offset - 1)
+            starts = f.read(1) == b'\n'
+        else:
+            starts = True
+        data = f.read(length)
+        if data and not data.endswith(b'\n'):
+            data += f.readline()  # the last line starts here, it is counted here
+    if not starts:
+        data = data[data.find(b'\n') + 1:] if b'\n' in data else b''
+    counts = {}
+    lines = 0
+    for raw in data.splitlines():
+        line = raw.decode('utf-8', 'replace').rstrip()
+        if not record(line):
+            continue
+        try:
+            key = extract(split(line), columns)
+        except (IndexError, KeyError, ValueError):
+            continue
+        lines += 1
+        if key is None:
+            continue
+        counts[key] = counts.get(key, 0) + 1
+    return counts, lines, len(data)
+
+
+def estimate(samples, sizes, key):
+    # Stratified random sample: a stratum of N units with n read adds N/n times the sum of
+    # its units to the total, and N^2 (1 - n/N) s^2 / n to its variance (s^2 the sample
+    # variance of its units). The share is a ratio estimate, its variance comes from the
+    # linearized residuals hits - share * lines.
+    groups = {}
+    for counts, n_lines, _, stratum in samples:
+        groups.setdefault(stratum, []).append((counts.get(key, 0), n_lines))
+    total = sum(sizes[h][0] / sizes[h][1] * sum(y for y, _ in v) for h, v in groups.items())
+    lines = sum(sizes[h][0] / sizes[h][1] * sum(l for _, l in v) for h, v in groups.items())
+    share = total / lines if lines else 0
+    var_total = var_share = 0
+    for stratum, values in groups.items():
+        big_n, n = sizes[stratum]
+        if n < 2 or n == big_n:
+            continue  # Read whole (no sampling error) or too small to tell
+        ys = [y for y, _ in values]
+        rs = [y - share * l for y, l in values]
+        factor = big_n ** 2 * (1 - n / big_n) / n
+        var_total += factor * variance(ys)
+        var_share += factor * variance(rs)
+    if lines:
+        var_share /= lines ** 2
+    return total, Z95 * math.sqrt(var_total), share, Z95 * math.sqrt(var_share)
+
+
+def variance(values):
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate the top N from a sample of the logs')
+    parser.add_argument('directory', nargs='?', default='RAWLogs')
+    parser.add_argument('--analysis', required=True, choices=sorted(logparse.ANALYSES))
+    parser.add_argument('--percent', type=float, default=1.0, help='percent of the data to read (default 1)')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--chunk', type=int, default=CHUNK, help='bytes per sampled chunk')
+    parser.add_argument('--seed', type=int, help='repeatable samples')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    files = [os.path.join(args.directory, f) for f in sorted(os.listdir(args.directory)) if not f.startswith('.')]
+    files = [(f, os.path.getsize(f)) for f in files if os.path.isfile(f)]
+    total = sum(size for _, size in files)
+    if not total:
+        print('No data')
+        return
+
+    started = time.monotonic()
+    samples = []
+    read = 0
+    fmt = logparse.ANALYSES[args.analysis][0]
+    headers = {}
+    units, sizes = plan(files, int(total * args.percent / 100), args.chunk)
+    for path, offset, length, stratum in units:
+        if path not in headers:
+            with open(path, 'rb') as f:
+                headers[path] = logparse.file_columns(f, fmt)
+        counts, lines, size = read_chunk(path, offset, length, args.analysis, headers[path])
+        samples.append((counts, lines, size, stratum))
+        read += size
+
+    sampled = {}
+    for counts, _, _, _ in samples:
+        logparse.merge_counts(sampled, counts)
+    top = sorted(sampled, key=lambda k: -sampled[k])[:args.top]
+    estimated_lines = sum(sizes[h][0] / sizes[h][1] * l for _, l, _, h in samples)
+
+    print(f'Read {read} of {total} bytes ({100 * read / total:.2f}%) from {len(files)} files '
+          f'in {len(samples)} samples (whole files or chunks), {time.monotonic() - started:.1f}s')
+    print(f'Estimated {estimated_lines:,.0f} entries, {len(sampled)} distinct keys seen in the sample\n')
+    print(f'{"estimate":>14} {"+/- 95%":>12} {"share":>8} {"+/- 95%":>8}  key')
+    for key in top:
+        count, count_err, share, share_err = estimate(samples, sizes, key)
+        print(f'{count:>14,.0f} {count_err:>12,.0f} {100 * share:>7.2f}% {100 * share_err:>7.2f}%  {key}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
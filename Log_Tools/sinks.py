@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+import os
+import sys
+import csv
+import gzip
+import json
+import argparse
+from abc import ABC, abstractmethod
+import snapshot
+# Output formats for the counts. The format is picked from the file name:
+#
+#   Analyzed.txt     same as sort | uniq -c | sort -nr (Step4.sh)
+#   Analyzed.csv     count,key with a header line
+#   Analyzed.jsonl   one {"key": ..., "count": ...} per line
+#   Analyzed.prom    Prometheus text format, for the node_exporter textfile collector. Only
+#                    the totals and the PROM_TOP (--prom-top) biggest keys are exported, one
+#                    series per key would be one time series per client IP or domain
+#   Analyzed.snap    binary snapshot (see snapshot.py), .snap.gz for a gzip compressed one
+#
+# Every sink writes one row at a time to a temporary file and renames it into place when
+# done, so a reader (or Prometheus) never sees half a file and the output is never built
+# up in memory as one big string.
+#
+# Convert an existing Analyzed.txt:  python3 ../Log_Tools/sinks.py Analyzed.txt Analyzed.csv Analyzed.prom
+
+PROM_TOP = 100
+
+
+class Sink(ABC):
+    order = 'count'  # rows are written highest count first, 'key' for sorted by key
+
+    def __init__(self, path, analysis, total, top=PROM_TOP):
+        # total is the number of keys, top the number of keys a summary sink (.prom) keeps
+        self.path = path
+        self.tmp = path + '.tmp'
+        self.analysis = analysis
+        self.total = total
+        self.top = top
+        self.file = self.open()
+
+    def open(self):
+        return open(self.tmp, 'w', newline='')
+
+    @abstractmethod
+    def write(self, key, n):
+        pass
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp, self.path)
+
+
+class TextSink(Sink):
+    def write(self, key, n):
+        self.file.write(f'{n:>7} {key}\n')
+
+
+class CsvSink(Sink):
+    def open(self):
+        f = super().open()
+        self.writer = csv.writer(f)
+        self.writer.writerow(['count', 'key'])
+        return f
+
+    def write(self, key, n):
+        self.writer.writerow([n, key])
+
+
+class JsonLinesSink(Sink):
+    def write(self, key, n):
+        self.file.write(json.dumps({'analysis': self.analysis, 'key': key, 'count': n}) + '\n')
+
+
+class PrometheusSink(Sink):
+    # log_analyzer_hits{analysis, key} for the top keys only (rows come highest count first),
+    # the rest are summed up in log_analyzer_hits_other. The totals are written at the end.
+    metric = 'log_analyzer_hits'
+
+    def open(self):
+        self.hits = self.other = self.written = 0
+        f = super().open()
+        f.write(f'# HELP {self.metric} Log lines counted per key by the log analyzers, top keys only.\n')
+        f.write(f'# TYPE {self.metric} gauge\n')
+        return f
+
+    def write(self, key, n):
+        self.hits += n
+        if self.written >= self.top:
+            self.other += n
+            return
+        self.written += 1
+        key = key.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        self.file.write(f'{self.metric}{{analysis="{self.analysis}",key="{key}"}} {n}\n')
+
+    def close(self):
+        labels = f'{{analysis="{self.analysis}"}}'
+        for name, text, value in (
+            ('hits_total', 'Log lines counted by the log analyzers.', self.hits),
+            ('hits_other', f'Log lines of the keys that are not in {self.metric}.', self.other),
+            ('keys', 'Distinct keys counted by the log analyzers.', self.total),
+        ):
+            self.file.write(f'# HELP log_analyzer_{name} {text}\n# TYPE log_analyzer_{name} gauge\n')
+            self.file.write(f'log_analyzer_{name}{labels} {value}\n')
+        super().close()
+
+
+class SnapshotSink(Sink):
+    order = 'key'
+    compress = False
+
+    def __init__(self, path, analysis, total, top=PROM_TOP):
+        super().__init__(path, analysis, total, top)
+        self.file.write(snapshot.MAGIC)
+        self.file.write(snapshot.HEADER.pack(total))
+
+    def open(self):
+        if self.compress:
+            return gzip.open(self.tmp, 'wb', compresslevel=6)
+        return open(self.tmp, 'wb')
+
+    def write(self, key, n):
+        key = key.encode('utf-8')
+        self.file.write(snapshot.ENTRY.pack(len(key), n))
+        self.file.write(key)
+
+
+class CompressedSnapshotSink(SnapshotSink):
+    compress = True
+
+
+# Longest match wins, so .snap.gz comes before .snap
+SINKS = [
+    ('.snap.gz', CompressedSnapshotSink),
+    ('.snap', SnapshotSink),
+    ('.jsonl', JsonLinesSink),
+    ('.csv', CsvSink),
+    ('.prom', PrometheusSink),
+    ('.txt', TextSink),
+]
+
+
+def sink_for(path):
+    for ext, sink in SINKS:
+        if path.endswith(ext):
+            return sink
+    return TextSink
+
+
+def output_name(path, analysis):
+    # Analyzed.txt -> Analyzed.dns-clients.txt, for one output per analysis
+    for ext, _ in SINKS:
+        if path.endswith(ext):
+            return f'{path[:-len(ext)]}.{analysis}{ext}'
+    return f'{path}.{analysis}'
+
+
+def write_counts(paths, counts, analysis='', top=PROM_TOP):
+    # Writes counts (key -> count) to every path, in the format its name asks for.
+    # The keys are sorted once per order and each row is handed to the sinks as it comes.
+    sinks = [sink_for(p)(p, analysis, len(counts), top) for p in paths]
+    for order in ('count', 'key'):
+        group = [s for s in sinks if s.order == order]
+        if not group:
+            continue
+        if order == 'count':
+            keys = sorted(counts, key=lambda k: (-counts[k], k))
+        else:
+            keys = sorted(counts, key=lambda k: k.encode('utf-8'))
+        for key in keys:
+            n = counts[key]
+            for s in group:
+                s.write(key, n)
+    for s in sinks:
+        s.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert an Analyzed.txt to other formats')
+    parser.add_argument('analyzed')
+    parser.add_argument('outputs', nargs='+', help='.txt .csv .jsonl .prom .snap .snap.gz')
+    parser.add_argument('--analysis', default='', help='label for the jsonl and prom outputs')
+    parser.add_argument('--prom-top', type=int, default=PROM_TOP, help=f'keys exported to .prom outputs (default {PROM_TOP})')
+    args = parser.parse_args()
+
+    counts = {}
+    for key, n in snapshot.read_analyzed(args.analyzed):
+        key = key.decode('utf-8', 'replace')
+        counts[key] = counts.get(key, 0) + n
+    write_counts(args.outputs, counts, args.analysis, args.prom_top)
+    print(f'Wrote {len(counts)} keys to {", ".join(args.outputs)}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
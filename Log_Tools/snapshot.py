@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import os
+import sys
+import gzip
+import heapq
+import struct
+import argparse
+from datetime import datetime
+# Saves the counts from an Analyzed.txt (sort | uniq -c output) into a compact binary
+# snapshot, and diffs any two snapshots without going back to the logs.
+#
+# Save:  python3 ../Log_Tools/snapshot.py save Analyzed.txt
+# Diff:  python3 ../Log_Tools/snapshot.py diff Snapshots/old.snap Snapshots/new.snap
+#
+# Snapshot layout: MAGIC, entry count, then (key length, count, key bytes) sorted by key.
+# Because both files are sorted, a diff is a single merge pass over the two files.
+
+MAGIC = b'LOGSNAP1'
+HEADER = struct.Struct('<Q')
+ENTRY = struct.Struct('<IQ')
+snapshot_dir = 'Snapshots'
+
+
+def read_analyzed(path):
+    # "   1234 key" lines from uniq -c
+    with open(path, 'rb') as f:
+        for line in f:
+            line = line.rstrip(b'\r\n').lstrip()
+            if not line:
+                continue
+            n, _, key = line.partition(b' ')
+            yield key, int(n)
+
+
+def write_snapshot(path, counts):
+    # counts is an iterable of (key bytes, count), it does not need to be sorted
+    entries = {}
+    for key, n in counts:
+        entries[key] = entries.get(key, 0) + n
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(entries)))
+        for key in sorted(entries):
+            f.write(ENTRY.pack(len(key), entries[key]))
+            f.write(key)
+    os.replace(tmp, path)
+    return len(entries)
+
+
+def read_snapshot(path):
+    # Streams (key, count) in key order without loading the whole snapshot.
+    # Also reads gzip compressed snapshots (.snap.gz from sinks.py).
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    with (gzip.open if compressed else open)(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a snapshot file')
+        total, = HEADER.unpack(f.read(HEADER.size))
+        for _ in range(total):
+            size, n = ENTRY.unpack(f.read(ENTRY.size))
+            yield f.read(size), n
+
+
+def merge(old, new):
+    # Sorted-key merge join, yields (key, old count, new count) with 0 for a missing side
+    a, b = next(old, None), next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[0], a[1], 0
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            yield b[0], 0, b[1]
+            b = next(new, None)
+        else:
+            yield a[0], a[1], b[1]
+            a, b = next(old, None), next(new, None)
+
+
+def diff(old_path, new_path, top):
+    new_keys, vanished, up, down = [], [], [], []
+    counts = {'new': 0, 'vanished': 0, 'changed': 0, 'same': 0}
+
+    def keep(heap, score, item):
+        # Only the top N of each list are kept in memory
+        if len(heap) < top:
+            heapq.heappush(heap, (score, item))
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, (score, item))
+
+    for key, a, b in merge(read_snapshot(old_path), read_snapshot(new_path)):
+        if a == 0:
+            counts['new'] += 1
+            keep(new_keys, b, (key, a, b))
+        elif b == 0:
+            counts['vanished'] += 1
+            keep(vanished, a, (key, a, b))
+        elif a != b:
+            counts['changed'] += 1
+            keep(up if b > a else down, abs(b - a), (key, a, b))
+        else:
+            counts['same'] += 1
+
+    print(f'{old_path} -> {new_path}')
+    print(', '.join(f'{v} {k}' for k, v in counts.items()))
+    for title, heap in (('NEW', new_keys), ('VANISHED', vanished),
+                        ('BIGGEST INCREASES', up), ('BIGGEST DECREASES', down)):
+        print(f'\n{title}')
+        for _, (key, a, b) in sorted(heap, reverse=True):
+            print(f'{a:>12} -> {b:<12} {b - a:+d}\t{key.decode("utf-8", "replace")}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Save and diff count snapshots')
+    sub = parser.add_subparsers(dest='command', required=True)
+    save = sub.add_parser('save', help='save an Analyzed.txt as a snapshot')
+    save.add_argument('analyzed')
+    save.add_argument('output', nargs='?', help=f'default {snapshot_dir}/<timestamp>.snap')
+    d = sub.add_parser('diff', help='compare two snapshots')
+    d.add_argument('old')
+    d.add_argument('new')
+    d.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+
+    if args.command == 'save':
+        output = args.output
+        if output is None:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            output = os.path.join(snapshot_dir, datetime.now().strftime('%Y-%m-%d_%H%M%S') + '.snap')
+        n = write_snapshot(output, read_analyzed(args.analyzed))
+        print(f'Saved {n} keys to {output}')
+    else:
+        diff(args.old, args.new, args.top)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
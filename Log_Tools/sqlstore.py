@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import dedup
+import logparse
+import timeindex
+# Loads the counts into a local SQLite database, per time bucket, so ad-hoc questions are
+# a SQL query instead of reloading Analyzed.txt into a spreadsheet.
+#
+#   python3 ../Log_Tools/sqlstore.py load Logs.db --analysis dns-clients --bucket hour
+#   python3 ../Log_Tools/sqlstore.py query Logs.db "SELECT client, SUM(hits) FROM dns_clients WHERE bucket >= '2025-03' GROUP BY client ORDER BY 2 DESC LIMIT 20"
+#
+# Loading is incremental: the database remembers how far each file was read, and only the
+# new lines are counted and added (upserted) to the existing rows. A file that was replaced
+# (smaller, or its first bytes changed) is loaded again from the start. The bucket size is
+# fixed per analysis on its first load, hour and day buckets can't be mixed in one SUM.
+#
+# Tables and views:
+#   counts(analysis, bucket, key, hits)   every analysis, one row per time bucket and key
+#   dns_clients(bucket, client, hits), dns_domains(bucket, domain, hits), iis_endpoints(bucket, endpoint, hits)
+#   dns_qtypes(bucket, qtype, hits), dns_rcodes(bucket, rcode, hits), dns_nxdomain_clients(bucket, client, hits)
+#   files(analysis, path, size, offset, head)   how far each file has been loaded
+#   analyses(analysis, bucket)            the bucket size of each analysis
+
+BATCH_ROWS = 200000  # Rows per transaction
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS counts (
+    analysis TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (analysis, bucket, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_key ON counts (analysis, key);
+CREATE INDEX IF NOT EXISTS counts_bucket ON counts (bucket);
+CREATE TABLE IF NOT EXISTS files (
+    analysis TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    head TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (analysis, path)
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    analysis TEXT PRIMARY KEY,
+    bucket TEXT NOT NULL
+);
+CREATE VIEW IF NOT EXISTS dns_clients AS
+    SELECT bucket, key AS client, hits FROM counts WHERE analysis = 'dns-clients';
+CREATE VIEW IF NOT EXISTS dns_domains AS
+    SELECT bucket, key AS domain, hits FROM counts WHERE analysis = 'dns-domains';
+CREATE VIEW IF NOT EXISTS dns_qtypes AS
+    SELECT bucket, key AS qtype, hits FROM counts WHERE analysis = 'dns-qtypes';
+CREATE VIEW IF NOT EXISTS dns_rcodes AS
+    SELECT bucket, key AS rcode, hits FROM counts WHERE analysis = 'dns-rcodes';
+CREATE VIEW IF NOT EXISTS dns_nxdomain_clients AS
+    SELECT bucket, key AS client, hits FROM counts WHERE analysis = 'dns-nxdomain-clients';
+CREATE VIEW IF NOT EXISTS iis_endpoints AS
+    SELECT bucket, key AS endpoint, hits FROM counts WHERE analysis = 'iis-endpoints';
+'''
+
+UPSERT = '''
+INSERT INTO counts (analysis, bucket, key, hits) VALUES (?, ?, ?, ?)
+ON CONFLICT (analysis, bucket, key) DO UPDATE SET hits = hits + excluded.hits
+'''
+
+
+def connect(path):
+    db = sqlite3.connect(path)
+    # WAL lets queries run while a load is going on, NORMAL sync is safe with WAL
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(SCHEMA)
+    # Databases from before the head column was added
+    if 'head' not in [row[1] for row in db.execute('PRAGMA table_info(files)')]:
+        db.execute("ALTER TABLE files ADD COLUMN head TEXT NOT NULL DEFAULT ''")
+    return db
+
+
+def check_bucket(db, analysis, bucket):
+    # The bucket size the analysis was loaded with, saved on its first load. Returns the
+    # saved one, which differs from bucket if the analysis was loaded with another size.
+    with db:
+        db.execute('INSERT OR IGNORE INTO analyses (analysis, bucket) VALUES (?, ?)', (analysis, bucket))
+    return db.execute('SELECT bucket FROM analyses WHERE analysis = ?', (analysis,)).fetchone()[0]
+
+
+def head(path, length):
+    # Hash of the first length bytes (up to dedup.SAMPLE), to notice a replaced file
+    return dedup.head_hash(path, min(length, dedup.SAMPLE))
+
+
+def load(db, directory, analysis, bucket):
+    offsets = {path: (offset, mark) for path, offset, mark in
+               db.execute('SELECT path, offset, head FROM files WHERE analysis = ?', (analysis,))}
+    pending = []   # rows waiting for the next transaction
+    files = []     # file positions to save with them
+    loaded = rows = 0
+
+    def flush():
+        with db:
+            db.executemany(UPSERT, pending)
+            db.executemany('INSERT OR REPLACE INTO files (analysis, path, size, offset, head) VALUES (?, ?, ?, ?, ?)', files)
+        pending.clear()
+        files.clear()
+
+    for path in timeindex.list_files(directory):
+        size = os.path.getsize(path)
+        start, mark = offsets.get(path, (0, ''))
+        if size < start:
+            print(f'{path} is smaller than last time, loading it again from the start')
+            start = 0
+        elif start and mark and head(path, start) != mark:
+            print(f'{path} was replaced, loading it again from the start')
+            start = 0
+        if size == start:
+            continue
+        try:
+            counts, end, _ = logparse.aggregate_file(path, analysis, start, bucket=bucket)
+        except OSError as e:
+            print(f'Error processing {path}: {e}')
+            continue
+        pending.extend((analysis, b, k, n) for (b, k), n in counts.items())
+        files.append((analysis, path, size, end, head(path, end)))
+        loaded += 1
+        rows += len(counts)
+        print(f'Processed {path}')
+        if len(pending) >= BATCH_ROWS:
+            flush()
+    flush()
+    # Refresh the planner statistics so lookups by key use the key index (sampled, so it stays quick)
+    db.execute('PRAGMA analysis_limit=1000')
+    db.execute('ANALYZE')
+    return loaded, rows
+
+
+def query(db, sql):
+    cursor = db.execute(sql)
+    if cursor.description:
+        print('\t'.join(d[0] for d in cursor.description))
+    for row in cursor:
+        print('\t'.join(str(v) for v in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load log counts into SQLite and query them')
+    sub = parser.add_subparsers(dest='command', required=True)
+    l = sub.add_parser('load', help='count new log lines and add them to the database')
+    l.add_argument('database')
+    l.add_argument('directory', nargs='?', default='RAWLogs')
+    l.add_argument('--analysis', required=True, choices=sorted(logparse.ANALYSES))
+    l.add_argument('--bucket', default='hour', choices=sorted(logparse.BUCKETS))
+    q = sub.add_parser('query', help='run a SQL statement')
+    q.add_argument('database')
+    q.add_argument('sql')
+    args = parser.parse_args()
+
+    db = connect(args.database)
+    if args.command == 'load':
+        saved = check_bucket(db, args.analysis, args.bucket)
+        if saved != args.bucket:
+            db.close()
+            parser.error(f'{args.analysis} is loaded with --bucket {saved} in {args.database}, '
+                         f'use that or another database')
+        started = time.monotonic()
+        loaded, rows = load(db, args.directory, args.analysis, args.bucket)
+        print(f'{loaded} files loaded, {rows} rows upserted in {time.monotonic() - started:.1f}s')
+    else:
+        query(db, args.sql)
+    db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
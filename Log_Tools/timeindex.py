@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+import logparse
+# First and last timestamp of every log file, so runs limited to a date range only open
+# the files that can have lines in that range. The timestamps come from the first log
+# line at the head of the file and the last one at the tail (seek to the end), so indexing
+# a file reads at most 2 x BLOCK bytes no matter how big it is.
+#
+#   python3 ../Log_Tools/timeindex.py build RAWLogs --format iis
+#   python3 ../Log_Tools/timeindex.py files RAWLogs --format iis --from 2025-03-14 --to 2025-03-14
+#
+# The index is kept in State/timeindex.json. An entry is only trusted while the file has
+# the same size and modified time, otherwise it is worked out again.
+
+BLOCK = 64 * 1024
+index_file = os.path.join('State', 'timeindex.json')
+
+
+def file_span(path, fmt):
+    # (first, last) timestamp of a file from its head and tail, None if there are no log lines
+    record = logparse.FORMATS[fmt]['record']
+    with open(path, 'rb') as f:
+        columns = logparse.file_columns(f, fmt)
+        head = f.read(BLOCK).split(b'\n')
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - BLOCK, 0))
+        tail = f.read().split(b'\n')
+    if size > BLOCK:
+        tail = tail[1:]  # Starts halfway through a line
+    first = last = None
+    for raw in head[:-1] if size > BLOCK else head:
+        line = raw.decode('utf-8', 'replace').rstrip()
+        if record(line):
+            first = line
+            break
+    for raw in reversed(tail):
+        line = raw.decode('utf-8', 'replace').rstrip()
+        if record(line):
+            last = line
+            break
+    if first is None or last is None:
+        return None
+    return logparse.line_span(fmt, first, last, columns)
+
+
+class TimeIndex:
+    def __init__(self, path=index_file):
+        self.path = path
+        self.entries = {}  # file path -> [size, mtime, first, last]
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def get(self, path):
+        entry = self.entries.get(path)
+        st = os.stat(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime:
+            return entry[2], entry[3]
+        return None
+
+    def set(self, path, span):
+        st = os.stat(path)
+        self.entries[path] = [st.st_size, st.st_mtime, span[0], span[1]]
+
+    def span(self, path, fmt):
+        # From the index, or from the head and tail of the file if it isn't indexed yet
+        span = self.get(path)
+        if span is None:
+            span = file_span(path, fmt)
+            if span:
+                self.set(path, span)
+        return span
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+def overlaps(span, low, high):
+    # Could a file covering span have lines between the dates low and high (either can be None)
+    if span is None:
+        return True  # Unknown, so it has to be read
+    first, last = span
+    return not ((low and last[:10] < low) or (high and first[:10] > high))
+
+
+def list_files(directory):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if not filename.startswith('.'):
+                yield os.path.join(root, filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index and select log files by time range')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, text in (('build', 'index every file in a folder'), ('files', 'print the files with lines between two dates')):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('directory')
+        p.add_argument('--format', required=True, choices=sorted(logparse.FORMATS))
+        p.add_argument('--index', default=index_file)
+        if name == 'files':
+            p.add_argument('--from', dest='low', help='YYYY-MM-DD')
+            p.add_argument('--to', dest='high', help='YYYY-MM-DD')
+    args = parser.parse_args()
+
+    index = TimeIndex(args.index)
+    for path in list_files(args.directory):
+        span = index.span(path, args.format)
+        if args.command == 'build':
+            print(f'{path}\t{span[0]}\t{span[1]}' if span else f'{path}\tno log lines')
+        elif overlaps(span, args.low, args.high):
+            print(path)
+    index.save()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import errno
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bloomfilter
+import dedup
+import logparse
+import sinks
+# Daemon mode: watches one or more drop folders and processes log files as they land,
+# instead of filling RAWLogs by hand and running the Step scripts in one big batch.
+#
+#   python3 ../Log_Tools/watcher.py --analysis iis-endpoints --watch RAWLogs --watch /mnt/web02
+#
+# New or finished files (closed after writing, or moved in) are queued to a pool of
+# worker processes. Each worker counts one file, the counts are merged into the saved
+# state (State/<analysis>.snap) and Analyzed.txt is rewritten every --report-every seconds.
+# A file that grows again (DNS.log) only has its new lines read, also while it stays open:
+# writes to a file that was already counted are picked up every --debounce seconds, a new
+# file that is written to without being closed once it has been quiet that long. Copies of
+# files that were already counted (or the already counted start of a newer DNS.log copy)
+# are skipped.
+# With --allow/--deny (see bloomfilter.py) allowlisted keys are not counted and denylist hits
+# are printed and appended to DenyHits.txt as they are found.
+
+RETRIES = 3  # times a file is handed out again after its worker died
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+
+class Inotify:
+    # Minimal inotify through ctypes, so nothing needs to be installed
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}
+        for d in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(d), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {d}')
+            self.dirs[wd] = d
+
+    def wait(self, timeout):
+        # Returns (path, finished) for the files that were written to, closed or moved in
+        # within timeout seconds. finished is False when the file was only written to.
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 65536)
+        paths, pos = [], 0
+        while pos < len(data):
+            wd, mask, _, size = EVENT.unpack_from(data, pos)
+            pos += EVENT.size
+            name = data[pos:pos + size].rstrip(b'\0')
+            pos += size
+            if wd in self.dirs and name:
+                paths.append((os.path.join(self.dirs[wd], os.fsdecode(name)), not mask & IN_MODIFY))
+        return paths
+
+
+class Poller:
+    # Fallback when inotify isn't available: look for changed sizes every few seconds
+    def __init__(self, directories):
+        self.directories = directories
+        self.sizes = {}
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        changed = []
+        for path in list_files(self.directories):
+            size = os.path.getsize(path)
+            if self.sizes.get(path) != size:
+                self.sizes[path] = size
+                changed.append((path, True))
+        return changed
+
+
+def list_files(directories):
+    for directory in directories:
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path) and not filename.startswith('.'):
+                yield path
+
+
+def ignore_interrupt():
+    # Ctrl+C is handled by the main process, which lets the workers finish their files
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Daemon:
+    def __init__(self, args):
+        self.args = args
+        self.state = logparse.State(args.state_dir, args.analysis)
+        self.prints = dedup.Fingerprints(os.path.join(args.state_dir, 'fingerprints.json'))
+        self.keys = bloomfilter.KeyFilter(args.allow, args.deny) if args.allow or args.deny else None
+        self.pool = ProcessPoolExecutor(max_workers=args.workers, initializer=ignore_interrupt)
+        self.running = {}     # future -> (path, pool it was submitted to)
+        self.failures = {}    # path -> times its worker died
+        self.in_flight = set()
+        self.again = set()    # files that changed while they were being processed
+        self.queue = []
+        self.waiting = []     # files to check again once the files in progress are recorded
+        self.modified = {}    # path -> (first, last) write seen, for files that are still open
+        self.dirty = False
+
+    def enqueue(self, path):
+        if path in self.in_flight:
+            self.again.add(path)
+        elif path not in self.queue and os.path.isfile(path):
+            self.queue.append(path)
+
+    def changed(self, path, finished):
+        if finished:
+            self.modified.pop(path, None)
+            self.enqueue(path)
+        else:
+            now = time.monotonic()
+            first, _ = self.modified.get(path, (now, now))
+            self.modified[path] = (first, now)
+
+    def settled(self):
+        # Queues the files still open for writing that are due: every --debounce seconds for a
+        # file that was counted before (it is growing), once it has been quiet for --debounce
+        # seconds for a new one (so a copy in progress isn't counted half done)
+        now = time.monotonic()
+        for path, (first, last) in list(self.modified.items()):
+            since = first if path in self.state.offsets else last
+            if now - since >= self.args.debounce:
+                del self.modified[path]
+                self.enqueue(path)
+
+    def submit(self):
+        # Bounded: never more than --max-pending files handed to the pool at once.
+        # A file that was in a pool that broke runs on its own, so if it breaks the pool
+        # again it was the one, and the files that were only next to it aren't blamed.
+        while self.queue and len(self.running) < self.args.max_pending:
+            if any(p in self.failures for p, _ in self.running.values()):
+                break
+            if self.queue[0] in self.failures and self.running:
+                break
+            path = self.queue.pop(0)
+            if not os.path.isfile(path):
+                continue  # Renamed or removed before we got to it
+            size = os.path.getsize(path)
+            start = self.state.start_offset(path)
+            if path not in self.state.offsets:
+                skip, original = self.prints.check(path)
+                if skip is None:
+                    self.waiting.append(path)  # Might be a copy of a file in progress
+                    continue
+                if skip == size:
+                    print(f'Skipped {path}, already counted from {original}')
+                    self.state.add(path, {}, size)
+                    self.dirty = True
+                    continue
+                if skip:
+                    print(f'Skipping the first {skip} bytes of {path}, already counted from {original}')
+                    start = skip
+            if start == size:
+                continue
+            if path not in self.state.offsets:
+                self.prints.pending(path)
+            future = self.pool.submit(logparse.aggregate_multi, path, (self.args.analysis,), start, keys=self.keys)
+            self.running[future] = (path, self.pool)
+            self.in_flight.add(path)
+
+    def collect(self):
+        for future in [f for f in self.running if f.done()]:
+            path, pool = self.running.pop(future)
+            self.in_flight.discard(path)
+            self.queue.extend(p for p in self.waiting if p not in self.queue)
+            self.waiting = []
+            try:
+                all_counts, end, _ = future.result()
+            except FileNotFoundError:
+                self.prints.forget(path)
+                continue  # Temporary file that was renamed, the rename has its own event
+            except BrokenProcessPool as e:
+                # A worker died (killed, out of memory), the pool is unusable from here on and
+                # every file in it fails. The pool is replaced once, the files are tried again.
+                self.prints.forget(path)
+                if pool is self.pool:
+                    print(f'Error processing {path}: {e}, restarting the worker pool')
+                    pool.shutdown(wait=False)
+                    self.pool = ProcessPoolExecutor(max_workers=self.args.workers, initializer=ignore_interrupt)
+                self.again.discard(path)
+                self.retry(path)
+                continue
+            except Exception as e:
+                # A bad file (or a bug) must not stop the daemon, log it and carry on
+                self.prints.forget(path)
+                print(f'Error processing {path}: {type(e).__name__}: {e}')
+                continue
+            self.failures.pop(path, None)
+            counts = all_counts[self.args.analysis]
+            self.deny_hits(path, all_counts.get(self.args.analysis + '.denied'))
+            self.state.add(path, counts, end)
+            self.prints.record(path)
+            self.dirty = True
+            print(f'Processed {path} ({sum(counts.values())} entries)')
+            if path in self.again:
+                self.again.discard(path)
+                self.enqueue(path)
+
+    def retry(self, path):
+        # Queues a file whose worker died again, up to RETRIES times (it may be the file
+        # that kills the worker), see submit
+        failures = self.failures.get(path, 0) + 1
+        if failures > RETRIES:
+            print(f'Giving up on {path}, its worker died {failures} times')
+            self.failures.pop(path, None)
+            return
+        self.failures[path] = failures
+        self.enqueue(path)
+
+    def deny_hits(self, path, denied):
+        if not denied:
+            return
+        with open(self.args.deny_output, 'a') as out:
+            for key, n in sorted(denied.items(), key=lambda kv: -kv[1]):
+                out.write(f'{path}\t{key}\t{n}\n')
+        print(f'Denylist: {len(denied)} keys ({sum(denied.values())} entries) in {path} -> {self.args.deny_output}')
+
+    def report(self):
+        self.state.save()
+        self.prints.save()
+        sinks.write_counts(self.args.output, self.state.counts, self.args.analysis, self.args.prom_top)
+        self.dirty = False
+        print(f'Updated {", ".join(self.args.output)} ({len(self.state.counts)} keys)')
+
+    def run(self):
+        try:
+            watcher = Inotify(self.args.watch)
+        except (OSError, AttributeError) as e:
+            print(f'inotify not available ({e}), polling every {self.args.poll} seconds')
+            watcher = Poller(self.args.watch)
+
+        # Catch up on anything that arrived while we weren't running
+        for path in list_files(self.args.watch):
+            self.enqueue(path)
+
+        next_report = time.monotonic() + self.args.report_every
+        try:
+            while True:
+                self.submit()
+                try:
+                    timeout = 0.2 if self.running else min(self.args.poll, 1.0) if self.modified else self.args.poll
+                    for path, finished in watcher.wait(timeout):
+                        self.changed(path, finished)
+                except OSError as e:
+                    if e.errno != errno.EINTR:
+                        raise
+                self.settled()
+                self.collect()
+                if self.dirty and time.monotonic() >= next_report:
+                    self.report()
+                    next_report = time.monotonic() + self.args.report_every
+        except KeyboardInterrupt:
+            print('Stopping, finishing files in progress...')
+            self.pool.shutdown(wait=True)
+            self.collect()
+            self.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch drop folders and keep the counts up to date')
+    parser.add_argument('--analysis', required=True, choices=sorted(logparse.ANALYSES))
+    parser.add_argument('--watch', action='append', required=True, help='folder to watch, can be repeated')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--max-pending', type=int, default=None, help='files queued to the pool at once (default 2 x workers)')
+    parser.add_argument('--report-every', type=int, default=300, help='seconds between Analyzed.txt refreshes')
+    parser.add_argument('--poll', type=float, default=5.0, help='seconds between checks when idle')
+    parser.add_argument('--debounce', type=float, default=10.0, help='seconds between reads of a file that is still being written')
+    parser.add_argument('--allow', action='append', default=[], help='allowlist .bloom file, can be repeated')
+    parser.add_argument('--deny', action='append', default=[], help='denylist .bloom file, can be repeated')
+    parser.add_argument('--deny-output', default='DenyHits.txt')
+    parser.add_argument('--state-dir', default='State')
+    parser.add_argument('--output', action='append', help='Analyzed.txt by default, can be repeated, see sinks.py for formats')
+    parser.add_argument('--prom-top', type=int, default=sinks.PROM_TOP, help=f'keys exported to .prom outputs (default {sinks.PROM_TOP})')
+    args = parser.parse_args()
+    args.output = args.output or ['Analyzed.txt']
+    if args.max_pending is None:
+        args.max_pending = args.workers * 2
+
+    Daemon(args).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())